@@ -0,0 +1,87 @@
+import numpy as np
+import decode
+
+### vectorized calendar arithmetic on datetime64[D] arrays
+
+def todays(dates):
+    ### dates are "YYYY-MM-DD" strings
+    return np.asarray(dates, dtype='datetime64[D]')
+
+def years(days):
+    return days.astype('datetime64[Y]').astype(np.int64) + 1970
+
+def months(days):
+    ### 1..12
+    return days.astype('datetime64[M]').astype(np.int64) % 12 + 1
+
+def isocalendar(days):
+    ### ISO year and week (1..53) as in datetime.date.isocalendar(); the ISO week belongs to the year of its Thursday
+    ordinals = days.astype(np.int64)
+    weekdays = (ordinals + 3) % 7  # monday=0, 1970-01-01 was a thursday
+    thursdays = (ordinals - weekdays + 3).astype('datetime64[D]')
+    isoyears = thursdays.astype('datetime64[Y]')
+    weeks = (thursdays - isoyears.astype('datetime64[D]')).astype(np.int64) // 7 + 1
+    return isoyears.astype(np.int64) + 1970, weeks
+
+def weeksinyear(year):
+    return int(isocalendar(np.array([np.datetime64(str(year)+'-12-28')]))[1][0])
+
+def weeknumbers(days):
+    ### consecutive number of the ISO week (weeks since the monday 1969-12-29), across year boundaries
+    return (days.astype(np.int64) + 3) // 7
+
+def mondays(weeknumbers):
+    return (np.asarray(weeknumbers, dtype=np.int64)*7 - 3).astype('datetime64[D]')
+
+### the period index covers whole years: months from january of the first year to december of the last year,
+### ISO weeks from week 1 of the first year to the last week of the last year (extended to entries in a neighbouring ISO year)
+
+def periodindex(days):
+    first_year = int(years(days.min()))
+    last_year = int(years(days.max()))
+    first_week = min(int(weeknumbers(np.datetime64(str(first_year)+'-01-04'))), int(weeknumbers(days.min())))
+    last_week = max(int(weeknumbers(np.datetime64(str(last_year)+'-12-28'))), int(weeknumbers(days.max())))
+    return {
+        'first_year': first_year,
+        'num_years': last_year - first_year + 1,
+        'first_month': np.datetime64(str(first_year), 'M'),
+        'num_months': 12*(last_year - first_year + 1),
+        'first_week': first_week,
+        'num_weeks': last_week - first_week + 1,
+    }
+
+def monthkeys(periods):
+    ### (year, month) of every month of the index
+    months = periods['first_month'] + np.arange(periods['num_months'])
+    return years(months.astype('datetime64[D]')), months.astype(np.int64) % 12 + 1
+
+def weekkeys(periods):
+    ### (ISO year, ISO week) of every week of the index
+    return isocalendar(mondays(periods['first_week'] + np.arange(periods['num_weeks'])))
+
+def monthindices(days, periods):
+    return (days.astype('datetime64[M]') - periods['first_month']).astype(np.int64)
+
+def weekindices(days, periods):
+    return weeknumbers(days) - periods['first_week']
+
+def _employeematrix(employee, period, billing, num_employees, num_periods):
+    ### employee x period matrix in a single bincount over flattened indices
+    flat = employee.astype(np.int64)*num_periods + period
+    return np.bincount(flat, weights=billing, minlength=num_employees*num_periods).reshape(num_employees, num_periods)
+
+def aggregate(table):
+    ### calendar bins are computed once per distinct date and then looked up through the date codes;
+    ### sums are taken over the exact amounts in øre and converted to NOK at the end
+    days = table['days']
+    periods = periodindex(days)
+    month_index = monthindices(days, periods)[table['date']]
+    week_index = weekindices(days, periods)[table['date']]
+    num_employees = len(table['numbers'])
+
+    billing = table['billing']
+    employee = table['employee']
+    periods['by_month'] = _employeematrix(employee, month_index, billing, num_employees, periods['num_months'])/decode.subunits
+    periods['by_week'] = _employeematrix(employee, week_index, billing, num_employees, periods['num_weeks'])/decode.subunits
+    periods['by_year'] = np.bincount(employee, weights=billing, minlength=num_employees)/decode.subunits
+    return periods
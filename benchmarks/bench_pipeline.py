@@ -0,0 +1,72 @@
+### parse, aggregate and render timings with throughput and peak memory on synthetic exports
+###   python benchmarks/bench_pipeline.py --layouts ssv,csv,xlsx --rows 100000 --employees 40 --years 1
+###   python benchmarks/bench_pipeline.py --layouts ssv,csv --rows 2000000 --processes 8 --norender   (chunked parsing)
+### peak memory is the tracemalloc peak of a second run of each stage, so it does not slow down the timed run
+import os
+import sys
+import time
+import argparse
+import functools
+import tempfile
+import resource
+import contextlib
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import generate
+
+
+def stage(function, *args):
+    t0 = time.perf_counter()
+    result = function(*args)
+    seconds = time.perf_counter()-t0
+    tracemalloc.start()
+    function(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Benchmark parse, aggregate and render')
+    parser.add_argument('--layouts', metavar='layouts', required=False, type=str, default='ssv,csv,xlsx', help='comma separated layouts')
+    parser.add_argument('--rows', metavar='rows', required=False, type=int, default=100000, help='rows per export')
+    parser.add_argument('--employees', metavar='employees', required=False, type=int, default=40, help='number of employees')
+    parser.add_argument('--years', metavar='years', required=False, type=int, default=1, help='number of years spanned')
+    parser.add_argument('--directory', metavar='directory', required=False, type=str, default='.', help='where synthetic exports are kept')
+    parser.add_argument('--norender', action='store_true', help='skip the render stage')
+    parser.add_argument('--processes', metavar='processes', required=False, type=int, default=1, help='parse delimited exports in chunks on this many processes')
+    args = parser.parse_args()
+
+    import plotprojectdata
+    parsers = {
+        'ssv': plotprojectdata.getbillingtable_ssv,
+        'csv': plotprojectdata.getbillingtable_csv,
+        'xlsx': plotprojectdata.getbillingtable_xlsx,
+    }
+
+    print("layout".ljust(7), "stage".ljust(10), "time [s]".rjust(9), "rows/s".rjust(12), "peak [MB]".rjust(10))
+    for layout in args.layouts.split(","):
+        fn = generate.synthetic(layout, args.rows, args.employees, args.years, directory=args.directory)
+        parse = parsers[layout]
+        if args.processes > 1 and layout != 'xlsx':
+            dialect = plotprojectdata.readers.sniff(fn)
+            parse = functools.partial(plotprojectdata.getbillingtable_chunked, columns=dialect['layout']['columns'], decimal=dialect['decimal'],
+                                      dateformat=dialect['dateformat'], processes=args.processes)
+        table, seconds, peak = stage(parse, fn)
+        stages = [('parse', seconds, peak)]
+        summary, seconds, peak = stage(plotprojectdata.summarize, table, 10000, True)
+        stages.append(('aggregate', seconds, peak))
+        if not args.norender:
+            import figures
+            with tempfile.TemporaryDirectory() as outdir, open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                jobs = plotprojectdata.figurejobs(summary, outdir)
+                _, seconds, peak = stage(figures.render, jobs)
+            stages.append(('render', seconds, peak))
+        for name, seconds, peak in stages:
+            print(layout.ljust(7), name.ljust(10), ("%.3f" % seconds).rjust(9), ("%.0f" % (args.rows/seconds)).rjust(12), ("%.1f" % (peak/1024**2)).rjust(10))
+
+    print("")
+    print("process peak RSS: %.1f MB" % (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024))
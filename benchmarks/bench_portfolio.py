@@ -0,0 +1,51 @@
+### wall time of the portfolio downloads and parsing against one project after the other, using the local maconomy stand-in
+###   python benchmarks/bench_portfolio.py --projects 20 --latency 0.5 [--failures 0.1]
+import os
+import sys
+import time
+import argparse
+import functools
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Benchmark portfolio downloads')
+    parser.add_argument('--projects', metavar='projects', required=False, type=int, default=10, help='number of projects')
+    parser.add_argument('--latency', metavar='latency', required=False, type=float, default=0.5, help='simulated latency per request in seconds')
+    parser.add_argument('--rows', metavar='rows', required=False, type=int, default=5000, help='rows per project')
+    parser.add_argument('--jobs', metavar='jobs', required=False, type=int, default=8, help='concurrent downloads')
+    parser.add_argument('--failures', metavar='failures', required=False, type=float, default=0, help='fraction of requests failing with a transient error')
+    args = parser.parse_args()
+
+    os.environ['FAKE_MACONOMY_LATENCY'] = str(args.latency)
+    os.environ['FAKE_MACONOMY_ROWS'] = str(args.rows)
+    import fakemaconomy
+    import maconomy
+    from plotprojectdata import download, getbudget, getbillingtable_ssv, fetchprojects
+
+    projects = [str(100000+i) for i in range(args.projects)]
+
+    t0 = time.perf_counter()
+    for p in projects:
+        getbillingtable_ssv(download(p, None, None, fakemaconomy.fetch))
+        getbudget(p, fakemaconomy.spy)
+    serial = time.perf_counter()-t0
+
+    t0 = time.perf_counter()
+    fetchprojects(projects, None, None, None, maconomy.Maconomy(fakemaconomy.fetch, functools.partial(getbudget, spy=fakemaconomy.spy), args.jobs, backoff=0.1))
+    parallel = time.perf_counter()-t0
+
+    ### a failing spy exits with an error that is not retried, so failures are only injected in process
+    fakemaconomy.failures = args.failures
+
+    t0 = time.perf_counter()
+    failed = fetchprojects(projects, None, None, None, fakemaconomy.client(args.jobs, backoff=0.1))[2]
+    inprocess = time.perf_counter()-t0
+    if failed:
+        print(len(failed), "projects with requests failing after their retries:", ", ".join(failed))
+
+    print("one after the other: %6.2f s" % serial)
+    print("concurrent, spy:     %6.2f s" % parallel)
+    print("concurrent, budget in process: %6.2f s" % inprocess)
@@ -0,0 +1,53 @@
+### cold-start latency of text-only reports
+###   python benchmarks/bench_startup.py --filename export.csv --repeat 5
+### wall time of the whole --table-only run and of a full run, plus the slowest imports of the table-only run
+import os
+import sys
+import time
+import argparse
+import subprocess
+import statistics
+
+script = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'plotprojectdata.py')
+
+
+def run(cmd):
+    t0 = time.perf_counter()
+    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter()-t0
+
+
+def slowestimports(cmd, n):
+    ### cumulative microseconds per top-level package from -X importtime
+    err = subprocess.run([sys.executable, '-X', 'importtime']+cmd[1:], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True).stderr
+    cumulative = {}
+    for line in err.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cum, name = line[len('import time:'):].split('|')
+        if not name.startswith('  '):
+            cumulative[name.strip()] = int(cum)
+    return sorted(cumulative.items(), key=lambda x: -x[1])[:n]
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Benchmark startup of text-only reports')
+    parser.add_argument('--filename', metavar='filename', required=True, type=str, help='export to report on')
+    parser.add_argument('--repeat', metavar='repeat', required=False, type=int, default=5, help='runs per mode')
+    args = parser.parse_args()
+
+    table_only = [sys.executable, script, '--filename', args.filename, '--table-only']
+    full = [sys.executable, script, '--filename', args.filename]
+    ### the first run writes the snapshot of the export
+    run(table_only)
+
+    print("mode".ljust(12), "median [s]".rjust(11), "min [s]".rjust(8))
+    for mode, cmd in (('table-only', table_only), ('full', full)):
+        times = [run(cmd) for _ in range(args.repeat)]
+        print(mode.ljust(12), ("%.3f" % statistics.median(times)).rjust(11), ("%.3f" % min(times)).rjust(8))
+
+    print("")
+    print("slowest imports of the table-only run [ms]:")
+    for name, us in slowestimports(table_only, 8):
+        print("  "+name.ljust(30), ("%.1f" % (us/1000)).rjust(8))
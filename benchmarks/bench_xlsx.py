@@ -0,0 +1,75 @@
+### peak RSS and runtime of the streaming xlsx reader against the previous full-load path
+###   python benchmarks/bench_xlsx.py --rows 200000
+###   python benchmarks/bench_xlsx.py --filename ExportProjectCard_123.xlsx
+import os
+import sys
+import time
+import argparse
+import datetime
+import resource
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import generate
+
+
+def legacy(fn):
+    ### full workbook in memory and three random-access walks, as before the streaming reader
+    from openpyxl import load_workbook
+    wb = load_workbook(filename=fn)
+    wbs = wb[wb.sheetnames[0]]
+    columns = {wbs.cell(1, i).value: i for i in range(1, wbs.max_column+1)}
+    for _ in range(3):
+        data = {}
+        for i in range(2, wbs.max_row+1):
+            datestr = wbs.cell(i, columns["Date"]).value
+            date = datetime.datetime.strptime(datestr.replace("=Date(","").replace(")",""), "%Y,%m,%d")
+            datestr = str(date.day)+"."+str(date.month)+"."+str(date.year)
+            value = float(wbs.cell(i, columns["Billing Price, Reg."]).value.replace("=", "").replace(",", "."))
+            number = wbs.cell(i, columns["Employee No."]).value
+            data[(number, datestr)] = data.get((number, datestr), 0) + value
+    wb.close()
+
+
+def streaming(fn):
+    from plotprojectdata import getbillingtable_xlsx
+    getbillingtable_xlsx(fn)
+
+
+def imports(fn):
+    ### floor of the streaming path: plotprojectdata with numpy, and openpyxl imported, nothing read; matplotlib is not
+    import plotprojectdata
+    import openpyxl
+
+
+def measure(mode, fn):
+    ### run in a fresh process so that the peak RSS of one path does not hide the other
+    out = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--run', mode, '--filename', fn])
+    seconds, maxrss = out.split()
+    return float(seconds), int(maxrss)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Benchmark xlsx ingestion')
+    parser.add_argument('--filename', metavar='filename', required=False, type=str, help='xlsx export to read, a synthetic one is written if omitted')
+    parser.add_argument('--rows', metavar='rows', required=False, type=int, default=100000, help='rows of the synthetic export')
+    parser.add_argument('--run', choices=['imports', 'legacy', 'streaming'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        t0 = time.perf_counter()
+        {'imports': imports, 'legacy': legacy, 'streaming': streaming}[args.run](args.filename)
+        print(time.perf_counter()-t0, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+        sys.exit(0)
+
+    if not args.filename:
+        print("writing synthetic export...", end=" ", flush=True)
+        args.filename = generate.synthetic('xlsx', args.rows)
+        print("done.")
+
+    print("path".ljust(10), "time [s]".rjust(10), "peak RSS [MB]".rjust(14))
+    for mode in ('imports', 'legacy', 'streaming'):
+        seconds, maxrss = measure(mode, args.filename)
+        print(mode.ljust(10), ("%.2f" % seconds).rjust(10), ("%.1f" % (maxrss/1024)).rjust(14))
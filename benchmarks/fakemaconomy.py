@@ -0,0 +1,65 @@
+### local stand-in for sintefpy.projectdata.fetch and the "spy" command line tool, with simulated network latency
+###   fetch(projectnumber, output_file=..., start=..., end=...) writes a synthetic semicolon separated export
+###   python benchmarks/fakemaconomy.py project get-budget -p 123 writes budget_123.csv
+###   budget(projectnumber) returns the same total budget in KNOK in process, client() is a maconomy.Maconomy on both
+###   a fraction FAKE_MACONOMY_FAILURES of the requests fails with a ConnectionError after the latency
+import os
+import sys
+import time
+import random
+import datetime
+
+latency = float(os.environ.get('FAKE_MACONOMY_LATENCY', '0.5'))
+rows = int(os.environ.get('FAKE_MACONOMY_ROWS', '5000'))
+failures = float(os.environ.get('FAKE_MACONOMY_FAILURES', '0'))
+
+spy = (sys.executable, os.path.abspath(__file__))
+
+
+def _request():
+    time.sleep(latency)
+    if random.random() < failures:
+        raise ConnectionError('connection reset by fake maconomy')
+
+
+def fetch(projectnumber, output_file, start=None, end=None):
+    _request()
+    rng = random.Random(str(projectnumber))
+    start = start or datetime.date(datetime.date.today().year, 1, 1)
+    end = end or datetime.date.today()
+    span = max((end-start).days, 0)
+    with open(output_file, 'w') as f:
+        f.write("entrydate;employeenumber;employeenamevar;billingpriceregcurrency\n")
+        for i in range(rows):
+            e = rng.randrange(20)
+            date = start + datetime.timedelta(days=rng.randint(0, span))
+            f.write("%s;%d;Employee %d;%d.%02d\n" % (date.isoformat(), 1000+e, e, rng.randrange(100, 3000), rng.randrange(100)))
+    return output_file
+
+
+def _totalbudget(projectnumber):
+    return random.Random(str(projectnumber)).randrange(2000, 20000)*1000
+
+
+def getbudget(projectnumber):
+    _request()
+    with open('budget_'+str(projectnumber)+'.csv', 'w') as f:
+        f.write("Task;Budget\n")
+        f.write("Total;%d\n" % _totalbudget(projectnumber))
+
+
+def budget(projectnumber):
+    _request()
+    return _totalbudget(projectnumber)//1000
+
+
+def client(jobs=8, timeout=600, retries=3, backoff=1.):
+    import maconomy
+    return maconomy.Maconomy(fetch, budget, jobs, timeout, retries, backoff)
+
+
+if __name__ == "__main__":
+    ### spy project get-budget -p <projectnumber>
+    if sys.argv[1:4] != ['project', 'get-budget', '-p'] or len(sys.argv) != 5:
+        sys.exit("usage: fakemaconomy.py project get-budget -p <projectnumber>")
+    getbudget(sys.argv[4])
@@ -0,0 +1,87 @@
+### synthetic Maconomy exports in the three supported layouts
+###   python benchmarks/generate.py --layout ssv --rows 1000000 --employees 200 --years 3 --filename export.csv
+###   ssv:  semicolon separated download (entrydate, employeenumber, employeenamevar, billingpriceregcurrency), amounts as 1 234.56
+###   csv:  semicolon separated manual export (Entry Date, Empl. No., Empl. Name, Billing Price), amounts as 1 234,56
+###   xlsx: ExportProjectCard workbook (Date, Employee No., Employee Name, Billing Price, Reg.) with =Date(Y,M,D) and =1234,56
+import os
+import argparse
+import numpy as np
+
+
+def records(rows, employees=40, years=1, startyear=2023, seed=0):
+    ### dates, employee indices and amounts in øre, in blocks to keep memory bounded
+    rng = np.random.default_rng(seed)
+    start = np.datetime64(str(startyear)+'-01-01')
+    days = (np.datetime64(str(startyear+years)+'-01-01') - start).astype(np.int64)
+    block = 100000
+    for offset in range(0, rows, block):
+        n = min(block, rows-offset)
+        dates = np.sort(start + rng.integers(0, days, n))
+        employee = rng.integers(0, employees, n)
+        amount = rng.integers(10000, 300000, n)
+        ### about one percent credits
+        amount[rng.random(n) < 0.01] *= -1
+        yield dates, employee, amount
+
+
+def _amount(ore, decimal):
+    sign = '-' if ore < 0 else ''
+    whole, frac = divmod(abs(int(ore)), 100)
+    return sign+'{:,}'.format(whole).replace(',', ' ')+decimal+'%02d' % frac
+
+
+def writessv(fn, rows, employees=40, years=1, startyear=2023, seed=0):
+    with open(fn, 'w') as f:
+        f.write("entrydate;employeenumber;employeenamevar;billingpriceregcurrency;text\n")
+        for dates, employee, amount in records(rows, employees, years, startyear, seed):
+            f.writelines("%s;%d;Employee %d;%s;synthetic\n" % (d, 1000+e, e, _amount(a, '.')) for d, e, a in zip(dates.astype(str), employee, amount))
+
+
+def writecsv(fn, rows, employees=40, years=1, startyear=2023, seed=0):
+    with open(fn, 'w') as f:
+        f.write("Entry Date;Empl. No.;Empl. Name;Billing Price;Text\n")
+        for dates, employee, amount in records(rows, employees, years, startyear, seed):
+            f.writelines("%s;%d;Employee %d;%s;synthetic\n" % (d, 1000+e, e, _amount(a, ',')) for d, e, a in zip(dates.astype(str), employee, amount))
+
+
+def writexlsx(fn, rows, employees=40, years=1, startyear=2023, seed=0):
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(["Date", "Employee No.", "Employee Name", "Billing Price, Reg.", "Text"])
+    for dates, employee, amount in records(rows, employees, years, startyear, seed):
+        for d, e, a in zip(dates.tolist(), employee, amount):
+            ws.append(["=Date(%d,%d,%d)" % (d.year, d.month, d.day), str(1000+e), "Employee %d" % e, "=%d,%02d" % divmod(a, 100) if a >= 0 else "=-%d,%02d" % divmod(-a, 100), "synthetic"])
+    wb.save(fn)
+
+
+layouts = {
+    'ssv': (writessv, '.csv'),
+    'csv': (writecsv, '.csv'),
+    'xlsx': (writexlsx, '.xlsx'),
+}
+
+
+def synthetic(layout, rows, employees=40, years=1, startyear=2023, seed=0, directory='.'):
+    ### file name of a synthetic export, written only if it does not exist yet
+    write, ext = layouts[layout]
+    fn = os.path.join(directory, 'synthetic_%s_%d_%d_%d%s' % (layout, rows, employees, years, ext))
+    if not os.path.exists(fn):
+        write(fn+'.tmp', rows, employees, years, startyear, seed)
+        os.replace(fn+'.tmp', fn)
+    return fn
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Write a synthetic Maconomy export')
+    parser.add_argument('--layout', choices=sorted(layouts), default='ssv', help='export layout')
+    parser.add_argument('--rows', metavar='rows', required=False, type=int, default=100000, help='number of rows')
+    parser.add_argument('--employees', metavar='employees', required=False, type=int, default=40, help='number of employees')
+    parser.add_argument('--years', metavar='years', required=False, type=int, default=1, help='number of years spanned')
+    parser.add_argument('--startyear', metavar='startyear', required=False, type=int, default=2023, help='first year')
+    parser.add_argument('--seed', metavar='seed', required=False, type=int, default=0, help='random seed')
+    parser.add_argument('--filename', metavar='filename', required=True, type=str, help='output file')
+    args = parser.parse_args()
+
+    layouts[args.layout][0](args.filename, args.rows, args.employees, args.years, args.startyear, args.seed)
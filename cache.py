@@ -0,0 +1,155 @@
+import os
+import csv
+import json
+import time
+import shutil
+import datetime
+import threading
+
+### on-disk cache of maconomy downloads
+###   one entry per project number and date range: the semicolon separated export and a json file with
+###   {'fetched': time of last refresh, 'used': time of last use, 'lastdate': last entrydate in the export}
+###   entries older than ttl seconds are refreshed by fetching only from their last entrydate on,
+###   the least recently used entries are evicted when the cache grows beyond maxbytes
+###   downloads go to <entry>.csv.<thread>.tmp and .delta files that are removed when the download fails; files of downloads
+###   that were given up and never finished are removed by evict once they are older than stale seconds
+
+delimiter = ";"
+_lock = threading.Lock()
+
+def defaultcachedir():
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'maconomy2python')
+
+def _entryname(projectnumber, start, end):
+    return 'data_'+str(projectnumber)+'_'+(start.isoformat() if start else 'open')+'_'+(end.isoformat() if end else 'open')
+
+def _readmeta(fn):
+    try:
+        with open(fn) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _writemeta(fn, meta):
+    with open(fn+'.tmp', 'w') as f:
+        json.dump(meta, f)
+    os.replace(fn+'.tmp', fn)
+
+def _lastdate(fn):
+    lastdate = None
+    with open(fn, newline='') as csv_file:
+        csv_reader = csv.reader(csv_file, delimiter=delimiter)
+        date_index = next(csv_reader).index('entrydate')
+        for row in csv_reader:
+            if row and (lastdate is None or row[date_index] > lastdate):
+                lastdate = row[date_index]
+    return lastdate
+
+def _merge(cached, delta, since, out):
+    ### rows of the cached export before the refresh date, followed by all rows of the delta
+    since = since.isoformat()
+    with open(out, 'w', newline='') as out_file:
+        csv_writer = csv.writer(out_file, delimiter=delimiter)
+        with open(cached, newline='') as csv_file:
+            csv_reader = csv.reader(csv_file, delimiter=delimiter)
+            header = next(csv_reader)
+            date_index = header.index('entrydate')
+            csv_writer.writerow(header)
+            csv_writer.writerows(row for row in csv_reader if row and row[date_index] < since)
+        with open(delta, newline='') as csv_file:
+            csv_reader = csv.reader(csv_file, delimiter=delimiter)
+            delta_header = next(csv_reader, None)
+            if delta_header is not None:
+                columns = [delta_header.index(c) for c in header]
+                csv_writer.writerows([row[i] for i in columns] for row in csv_reader if row)
+
+def evict(cachedir, maxbytes, keep=(), stale=3600):
+    entries = []
+    total = 0
+    now = time.time()
+    for fn in os.listdir(cachedir):
+        if fn.startswith('data_') and '.csv.' in fn and fn.endswith(('.tmp', '.delta')):
+            try:
+                if now - os.path.getmtime(os.path.join(cachedir, fn)) > stale:
+                    os.remove(os.path.join(cachedir, fn))
+            except OSError:
+                pass
+            continue
+        if not (fn.startswith('data_') and fn.endswith('.json')):
+            continue
+        name = fn[:-len('.json')]
+        meta = _readmeta(os.path.join(cachedir, fn)) or {}
+        path = os.path.join(cachedir, name+'.csv')
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        total += size
+        entries.append((meta.get('used', 0), name, size))
+    for used, name, size in sorted(entries):
+        if total <= maxbytes:
+            break
+        if name in keep:
+            continue
+        for ext in ('.csv', '.json'):
+            try:
+                os.remove(os.path.join(cachedir, name+ext))
+            except OSError:
+                pass
+        total -= size
+
+def cachedfetch(fetch, cachedir=None, ttl=3600, maxbytes=1024**3):
+    ### wraps fetch(projectnumber, output_file, start, end) with the cache, same signature
+    cachedir = cachedir or defaultcachedir()
+    os.makedirs(cachedir, exist_ok=True)
+
+    def fetchfromcache(projectnumber, output_file, start=None, end=None):
+        name = _entryname(projectnumber, start, end)
+        path = os.path.join(cachedir, name+'.csv')
+        metafn = os.path.join(cachedir, name+'.json')
+        meta = _readmeta(metafn)
+        now = time.time()
+        if meta is None or not os.path.exists(path) or now-meta['fetched'] > ttl:
+            since = None
+            if meta is not None and os.path.exists(path):
+                since = meta['lastdate'] and datetime.date.fromisoformat(meta['lastdate'])
+                if since and start:
+                    since = max(since, start)
+            tmp = path+'.%d.tmp' % threading.get_ident()
+            delta = path+'.%d.delta' % threading.get_ident()
+            try:
+                if since:
+                    ### only entries from the last cached entrydate on are fetched again
+                    fetch(projectnumber, output_file=delta, start=since, end=end)
+                    _merge(path, delta, since, tmp)
+                else:
+                    fetch(projectnumber, output_file=tmp, start=start, end=end)
+                os.replace(tmp, path)
+            finally:
+                for fn in (tmp, delta):
+                    if os.path.exists(fn):
+                        os.remove(fn)
+            meta = {'fetched': now, 'lastdate': _lastdate(path)}
+        meta['used'] = now
+        shutil.copyfile(path, output_file)
+        with _lock:
+            _writemeta(metafn, meta)
+            evict(cachedir, maxbytes, keep=(name,))
+        return output_file
+
+    return fetchfromcache
+
+def cachedbudget(getbudget, cachedir=None, ttl=3600):
+    ### wraps getbudget(projectnumber), the total budget is kept for ttl seconds
+    cachedir = cachedir or defaultcachedir()
+    os.makedirs(cachedir, exist_ok=True)
+
+    def budgetfromcache(projectnumber):
+        metafn = os.path.join(cachedir, 'budget_'+str(projectnumber)+'.json')
+        meta = _readmeta(metafn)
+        now = time.time()
+        if meta is None or now-meta['fetched'] > ttl:
+            meta = {'fetched': now, 'totalbudget': getbudget(projectnumber)}
+            with _lock:
+                _writemeta(metafn, meta)
+        return meta['totalbudget']
+
+    return budgetfromcache
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+### the repository root is on sys.path for the tests in tests/
+
+header = "Entry Date;Empl. No.;Empl. Name;Billing Price;Text"
+
+def makerows(n=400, start='2024-10-01', days=120, employees=8, low=100, high=3000, seed=0, dmy=False, signs=False, thousands=False, renamed=False):
+    ### (date, employee number, name, amount) rows of a csv export on random days from start, of random employees, with random
+    ### amounts from low to high NOK in øre
+    ###   dmy: dates as DD.MM.YYYY instead of YYYY-MM-DD
+    ###   signs: a third of the amounts negative as "x-" and a third as "(x)"
+    ###   thousands: amounts with a space as thousands separator
+    ###   renamed: employees get another name in the second half of the days, so the last name seen wins
+    rng = np.random.default_rng(seed)
+    result = []
+    for d, e, a, s in zip(rng.integers(0, days, n), rng.integers(0, employees, n), rng.integers(low*100, high*100, n), rng.integers(0, 3, n)):
+        day = str(np.datetime64(start) + int(d))
+        if dmy:
+            day = day[8:10]+"."+day[5:7]+"."+day[:4]
+        amount = ("{:,}".format(abs(int(a))//100).replace(",", " ") if thousands else str(abs(int(a))//100))+",%02d" % (abs(int(a)) % 100)
+        if signs and s:
+            amount = amount+"-" if s == 1 else "("+amount+")"
+        elif a < 0:
+            amount = "-"+amount
+        result.append((day, str(1000+e), "Person "+str(e)+(" Ø" if renamed and d >= days//2 else ""), amount))
+    return result
+
+@pytest.fixture
+def exportrows():
+    return makerows
+
+@pytest.fixture
+def csvexport(tmp_path):
+    ### csvexport(rows=None, name='export.csv', **kwargs) writes a csv export of rows, or of makerows(**kwargs), into tmp_path
+    ### and returns its path; the text column has a quoted delimiter
+    def write(rows=None, name='export.csv', **kwargs):
+        fn = tmp_path / name
+        with open(fn, 'w', encoding='utf-8') as f:
+            f.write(header+"\n")
+            for row in (makerows(**kwargs) if rows is None else rows):
+                f.write(";".join(row)+";\"text; with delimiter\"\n")
+        return str(fn)
+    return write
@@ -0,0 +1,124 @@
+import os
+import csv
+import json
+import numpy as np
+import aggregate
+import decode
+
+### structured export of project summaries (see plotprojectdata.summarize) at full precision, amounts in NOK
+### every table is a dict of equally long columns with a project column, so tables of many projects concatenate
+###   by_month:  employee billings per month
+###   by_week:   employee billings per ISO week
+###   by_year:   employee billings per calendar year
+###   employees: employee billings over all periods and projected billings at the end of the last period
+###   totals:    actuals, budget, remaining budget and forecast of the project
+### json writes one file of all tables, csv and parquet (requires pyarrow) one file per table: <name>_<table><ext>
+
+tablenames = ('by_month', 'by_week', 'by_year', 'employees', 'totals')
+
+def _ore(amounts):
+    ### amounts in NOK to exact øre, so sums of them do not pick up round off errors
+    return np.rint(np.asarray(amounts)*decode.subunits).astype(np.int64)
+
+def _employeetable(project, summary, matrix, keys):
+    num_employees, num_periods = matrix.shape
+    employee = np.repeat(np.arange(num_employees), num_periods)
+    columns = {
+        'project': np.full(num_employees*num_periods, str(project)),
+        'employeenumber': np.asarray(summary['numbers'])[employee],
+        'employeename': np.asarray(summary['names'])[employee],
+    }
+    for key, values in keys.items():
+        columns[key] = np.tile(values, num_employees)
+    columns['billing'] = matrix.ravel()
+    return columns
+
+def tables(summary, project):
+    budget = summary['totalbudget']*1000 if summary['totalbudget'] else np.nan
+    exhaustion = summary.get('exhaustion', np.datetime64('NaT'))
+    actuals = _ore(summary['billings_by_employees_by_year']).sum() if 'periods' in summary else _ore(summary['used'])
+    totals = {
+        'project': np.array([str(project)]),
+        'actuals': np.array([actuals/decode.subunits]),
+        'budget': np.array([budget]),
+        'remaining': np.array([(_ore(budget) - actuals)/decode.subunits if summary['totalbudget'] else np.nan]),
+        'projected': np.array([summary.get('projected', np.nan)]),
+        'exhaustion': np.array(['' if np.isnat(exhaustion) else str(exhaustion)]),
+    }
+    if 'periods' not in summary:
+        ### projects without billings
+        result = {name: {} for name in tablenames}
+        result['totals'] = totals
+        return result
+
+    periods = summary['periods']
+    years, months = aggregate.monthkeys(periods)
+    isoyears, weeks = aggregate.weekkeys(periods)
+    by_month = summary['billings_by_employees_by_month']
+    by_year = _ore(by_month).reshape(len(by_month), periods['num_years'], 12).sum(axis=2)/decode.subunits
+    num_employees = len(summary['numbers'])
+    employees = {
+        'project': np.full(num_employees, str(project)),
+        'employeenumber': np.asarray(summary['numbers']),
+        'employeename': np.asarray(summary['names']),
+        'billing': summary['billings_by_employees_by_year'],
+        'projected': summary.get('projected_by_employee', np.full(num_employees, np.nan)),
+    }
+    return {
+        'by_month': _employeetable(project, summary, by_month, {'year': years, 'month': months}),
+        'by_week': _employeetable(project, summary, summary['billings_by_employees_by_week'], {'isoyear': isoyears, 'week': weeks}),
+        'by_year': _employeetable(project, summary, by_year, {'year': periods['first_year'] + np.arange(periods['num_years'])}),
+        'employees': employees,
+        'totals': totals,
+    }
+
+def concat(alltables):
+    ### tables of several projects, in order
+    result = {}
+    for name in tablenames:
+        parts = [t[name] for t in alltables if t[name]]
+        result[name] = {column: np.concatenate([p[column] for p in parts]) for column in parts[0]} if parts else {}
+    return result
+
+def _values(column):
+    ### python values; floats keep all digits, nan becomes None (json null, empty csv field)
+    if column.dtype.kind == 'f':
+        return [None if np.isnan(v) else v for v in column.tolist()]
+    return column.tolist()
+
+def writejson(alltables, fn):
+    with open(fn, 'w') as f:
+        json.dump({name: {column: _values(values) for column, values in table.items()} for name, table in alltables.items()}, f)
+    return [fn]
+
+def _tablefiles(alltables, fn):
+    base, ext = os.path.splitext(fn)
+    return [(base+'_'+name+ext, table) for name, table in alltables.items() if table]
+
+def writecsv(alltables, fn):
+    fnames = []
+    for tfn, table in _tablefiles(alltables, fn):
+        with open(tfn, 'w', newline='') as f:
+            writer = csv.writer(f, delimiter=',')
+            writer.writerow(table.keys())
+            writer.writerows(zip(*[_values(values) for values in table.values()]))
+        fnames.append(tfn)
+    return fnames
+
+def writeparquet(alltables, fn):
+    import pyarrow
+    import pyarrow.parquet
+    fnames = []
+    for tfn, table in _tablefiles(alltables, fn):
+        pyarrow.parquet.write_table(pyarrow.table({column: pyarrow.array(values, from_pandas=True) for column, values in table.items()}), tfn)
+        fnames.append(tfn)
+    return fnames
+
+writers = {'.json': writejson, '.csv': writecsv, '.parquet': writeparquet}
+
+def write(alltables, fn):
+    ### format by file extension, returns the written files
+    _, ext = os.path.splitext(fn)
+    if ext not in writers:
+        raise NotImplementedError('export format '+ext)
+    return writers[ext](alltables, fn)
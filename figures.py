@@ -0,0 +1,153 @@
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import instrument
+
+### figure jobs: (function, kwargs) tuples that are independent of each other and can be rendered in any process,
+### every job saves its figure to fname and closes it
+###   lines: (xs, ys, fmt, label) tuples plotted on top of the bars, label None for unlabeled lines
+###   xticks: bar positions (1..n) of xticklabels, every bar if omitted
+
+def style():
+    plt.rcParams["figure.figsize"] = 12,8
+    plt.rcParams["axes.titlesize"] = 24
+    plt.rcParams["axes.labelsize"] = 20
+    plt.rcParams["lines.linewidth"] = 3
+    plt.rcParams["lines.markersize"] = 10
+    plt.rcParams["xtick.labelsize"] = 16
+    plt.rcParams["ytick.labelsize"] = 16
+    plt.style.use('bmh')
+
+def _plotlines(ax, lines):
+    for xs, ys, fmt, label in lines:
+        if label is None:
+            ax.plot(xs, ys, fmt)
+        else:
+            ax.plot(xs, ys, fmt, label=label)
+
+def _save(fig, fname):
+    ### fname is a file name or a multi-page document (PdfPages)
+    if hasattr(fname, 'savefig'):
+        fname.savefig(fig)
+    else:
+        fig.savefig(fname)
+    plt.close(fig)
+
+def _finish(fig, ax, text, fname):
+    ax.set_title(text)
+    fig.tight_layout()
+    _save(fig, fname)
+
+def _ticks(ax, n, xticks, xticklabels):
+    if xticklabels is not None:
+        ax.set_xticks(np.arange(1,n+1) if xticks is None else xticks)
+        ax.set_xticklabels(xticklabels)
+
+def barchart(fname, text, y, xticks=None, xticklabels=None, lines=(), legend=False):
+    n = len(y)
+    fig, ax = plt.subplots()
+    ax.bar(np.linspace(1,n,n),y/1000)
+    ax.set_ylabel('KNOK')
+    _ticks(ax, n, xticks, xticklabels)
+    _plotlines(ax, lines)
+    if legend:
+        ax.legend()
+    _finish(fig, ax, text, fname)
+
+def stackedbarchart(fname, text, series, labels, xticks=None, xticklabels=None, lines=()):
+    ### series: one row per stacked bar segment, legend in an axis of its own
+    n = series.shape[1]
+    fig, (ax,lax) = plt.subplots(ncols=2, gridspec_kw={"width_ratios":[4,1]})
+    bot = np.zeros(n)
+    for b, label in zip(series, labels):
+        ax.bar(np.linspace(1,n,n),b/1000, bottom=bot/1000, label=label)
+        bot+=b
+    ax.set_ylabel('KNOK')
+    _ticks(ax, n, xticks, xticklabels)
+    _plotlines(ax, lines)
+    h,l = ax.get_legend_handles_labels()
+    lax.legend(h,l, borderaxespad=0)
+    lax.axis("off")
+    _finish(fig, ax, text, fname)
+
+def piechart(fname, text, sizes, labels, explode=None):
+    ### legend outside, sorted by size
+    fig, ax = plt.subplots()
+    y = sizes
+    patches, texts = ax.pie(y, explode=explode, shadow=True, startangle=90)
+    percent = 100.*y/y.sum()
+    labels = ['{0} - {1:1.1f} %'.format(i,j) for i,j in zip(labels, percent)]
+    patches, labels, dummy =  zip(*sorted(zip(patches, labels, y), key=lambda x: x[2], reverse=True))
+    plt.legend(patches, labels, loc='center left', bbox_to_anchor=(-0.1, 1.))
+    ax.axis('equal')
+    _finish(fig, ax, text, fname)
+
+def labeledpiechart(fname, text, sizes, labels, explode=None):
+    ### legend within
+    fig, ax = plt.subplots()
+    ax.pie(sizes, explode=explode, labels=labels, autopct='%1.1f%%', shadow=True, startangle=90)
+    ax.axis('equal')
+    _finish(fig, ax, text, fname)
+
+def textpage(fname, text, body):
+    ### monospace text, e.g. the billing table, on a page of its own
+    fig = plt.figure()
+    fig.suptitle(text)
+    lines = body.count("\n") + 1
+    fig.text(0.03, 0.92, body, family='monospace', va='top', fontsize=max(4, min(12, 380/lines)))
+    _save(fig, fname)
+
+def _run(job):
+    ### (fname, event) of the stage, recorded by render in the calling process
+    function, kwargs = job
+    with instrument.measure('figure', detail=kwargs['text']) as event:
+        function(**kwargs)
+    return kwargs['fname'], event
+
+def _worker():
+    instrument.worker()
+    style()
+
+def pool(processes=None):
+    ### worker processes with the style applied once at startup, started right away (see instrument.startworkers)
+    return instrument.startworkers(ProcessPoolExecutor(max_workers=processes, initializer=_worker))
+
+def render(jobs, executor=None):
+    if executor is None:
+        style()
+        return [instrument.collect(_run(job)) for job in jobs]
+    return [instrument.collect(result) for result in executor.map(_run, jobs)]
+
+### batch reports of several projects: sections are (title, text, jobs)
+
+def pdfreport(fn, sections):
+    ### one pdf, a text page and the figures of every section; pages are rendered in this process with the style applied once
+    from matplotlib.backends.backend_pdf import PdfPages
+    style()
+    with PdfPages(fn) as pdf:
+        for title, body, jobs in sections:
+            textpage(pdf, title, body)
+            for function, kwargs in jobs:
+                with instrument.stage('figure', detail=kwargs['text']):
+                    function(**dict(kwargs, fname=pdf))
+    return fn
+
+def htmlreport(fn, sections, executor=None):
+    ### one self-contained html page, the figures are rendered as svg (on the executor) and inlined
+    import html
+    jobs = [job for _, _, sectionjobs in sections for job in sectionjobs]
+    render(jobs, executor)
+    with open(fn, 'w') as f:
+        f.write('<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>Project report</title>'
+                '<style>body{font-family:sans-serif} svg{max-width:100%;height:auto} pre{font-size:small}</style></head><body>\n')
+        f.write('<ul>'+''.join('<li><a href="#section%d">%s</a></li>' % (i, html.escape(title)) for i, (title, _, _) in enumerate(sections))+'</ul>\n')
+        for i, (title, body, sectionjobs) in enumerate(sections):
+            f.write('<h1 id="section%d">%s</h1>\n<pre>%s</pre>\n' % (i, html.escape(title), html.escape(body)))
+            for _, kwargs in sectionjobs:
+                with open(kwargs['fname']) as svg:
+                    content = svg.read()
+                f.write('<div>'+content[content.index('<svg'):]+'</div>\n')
+        f.write('</body></html>\n')
+    return fn
@@ -0,0 +1,41 @@
+import numpy as np
+
+### burn-rate forecasts from accumulated actuals
+###   a straight line y = a + b*x is fitted by closed-form least squares to the first n periods (x = 1..n),
+###   for every row of a (rows x periods) matrix at once, e.g. all employees of a project or all projects of a portfolio
+
+def linearfit(cumulative, n):
+    ### intercepts and slopes, one per row
+    y = np.atleast_2d(np.asarray(cumulative, dtype=np.float64))[:, :n]
+    x = np.arange(1, n+1, dtype=np.float64)
+    dx = x - x.mean()
+    ymean = y.mean(axis=1)
+    slope = (y - ymean[:, None]) @ dx / (dx @ dx)
+    return ymean - slope*x.mean(), slope
+
+def projected(intercept, slope, period):
+    ### accumulated actuals at the end of the given period
+    return intercept + slope*period
+
+def exhaustion(intercept, slope, budget, year):
+    ### date where the monthly fit reaches budget, NaT where it never does;
+    ### the fit is in months with x = k at the end of month k of year
+    budget = np.broadcast_to(np.asarray(budget, dtype=np.float64), np.shape(intercept))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        months = np.where(slope > 0, (budget - intercept)/slope, np.nan)
+    months = np.maximum(months, 0)
+    dates = np.full(np.shape(intercept), np.datetime64('NaT'), dtype='datetime64[D]')
+    ok = np.isfinite(months) & (months < 12*1000)
+    whole = np.floor(months[ok]).astype(np.int64)
+    start = (np.datetime64(str(year), 'M') + whole).astype('datetime64[D]')
+    length = (np.datetime64(str(year), 'M') + whole + 1).astype('datetime64[D]') - start
+    dates[ok] = start + np.floor((months[ok]-whole)*length.astype(np.float64)).astype(np.int64)
+    return dates
+
+def forecast(cumulative, n, periods, budget=None, year=None):
+    ### projected actuals at the end of the last period and, with a budget, the budget exhaustion date (monthly fits only)
+    intercept, slope = linearfit(cumulative, n)
+    result = {'intercept': intercept, 'slope': slope, 'projected': projected(intercept, slope, periods)}
+    if budget is not None and year is not None:
+        result['exhaustion'] = exhaustion(intercept, slope, budget, year)
+    return result
@@ -0,0 +1,179 @@
+import os
+import time
+import json
+import resource
+import threading
+import contextlib
+import tracemalloc
+
+### stage instrumentation: wall time, cpu time and peak memory of named stages, per project where there is one
+###   events of this process are collected in events; stages in worker processes return their event with the result (see remote)
+###   peak memory is the peak RSS of the process after the stage and, after tracememory(), the tracemalloc peak during the stage
+###   above the memory traced when it started; tracemalloc slows down python allocations and its peak is shared by stages
+###   running in parallel threads
+###   a stage that raises is recorded as well, with the name of the exception in error
+
+events = []
+_lock = threading.Lock()
+### open stages while tracing memory: the memory traced when they started and the highest traced memory seen since
+_open = []
+
+def tracememory():
+    tracemalloc.start()
+
+def worker():
+    ### initializer of worker processes: forked workers would inherit memory tracing and run slowly
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+def startworkers(executor):
+    ### a fork based process pool forks its workers on the first job; started before other threads run, no worker inherits
+    ### a lock held by another thread
+    executor.submit(int).result()
+    return executor
+
+def _foldpeak():
+    ### the traced peak since the last reset goes to all open stages before the peak is reset; called with _lock held
+    peak = tracemalloc.get_traced_memory()[1]
+    for frame in _open:
+        frame['peak'] = max(frame['peak'], peak)
+    tracemalloc.reset_peak()
+
+def _enter():
+    with _lock:
+        _foldpeak()
+        frame = {'baseline': tracemalloc.get_traced_memory()[0], 'peak': 0}
+        _open.append(frame)
+    return frame
+
+def _leave(frame):
+    ### traced peak of the stage above its baseline, enclosing stages keep their own peaks
+    with _lock:
+        if tracemalloc.is_tracing():
+            _foldpeak()
+        del _open[next(k for k, f in enumerate(_open) if f is frame)]
+    return max(frame['peak'] - frame['baseline'], 0)
+
+def _event(name, project, detail, start, cpu, peak_traced, error):
+    return {
+        'name': name,
+        'project': None if project is None else str(project),
+        'detail': detail,
+        'start': start,
+        'seconds': time.perf_counter() - start,
+        'cpu': time.thread_time() - cpu,
+        'peak_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss*1024,
+        'peak_traced': peak_traced,
+        'error': error,
+        'pid': os.getpid(),
+        'tid': threading.get_ident(),
+    }
+
+def record(event):
+    with _lock:
+        events.append(event)
+
+@contextlib.contextmanager
+def measure(name, project=None, detail=None, message=None):
+    ### yields the event dict, filled in when the stage is done; message is printed as a progress line
+    if message:
+        print(message+"...", end=" ", flush=True)
+    frame = _enter() if tracemalloc.is_tracing() else None
+    event = {}
+    start = time.perf_counter()
+    cpu = time.thread_time()
+    error = None
+    try:
+        yield event
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        event.update(_event(name, project, detail, start, cpu, None if frame is None else _leave(frame), error))
+        if message:
+            print("done." if error is None else "failed.", flush=True)
+
+@contextlib.contextmanager
+def stage(name, project=None, detail=None, message=None):
+    event = None
+    try:
+        with measure(name, project, detail, message) as event:
+            yield
+    finally:
+        if event is not None:
+            record(event)
+
+def remote(name, project, function, *args, **kwargs):
+    ### (result, event) of function(*args, **kwargs) in a worker process; the caller records the event
+    with measure(name, project) as event:
+        result = function(*args, **kwargs)
+    return result, event
+
+def collect(result):
+    ### result of remote(), recording its event
+    result, event = result
+    record(event)
+    return result
+
+def summary():
+    ### per stage: count, failed count, wall and cpu seconds, slowest call and largest peaks; per project: wall seconds
+    stages = {}
+    projects = {}
+    for e in events:
+        s = stages.setdefault(e['name'], {'count': 0, 'errors': 0, 'seconds': 0., 'cpu': 0., 'max': 0., 'peak_rss': 0, 'peak_traced': None})
+        s['count'] += 1
+        s['errors'] += e['error'] is not None
+        s['seconds'] += e['seconds']
+        s['cpu'] += e['cpu']
+        s['max'] = max(s['max'], e['seconds'])
+        s['peak_rss'] = max(s['peak_rss'], e['peak_rss'])
+        if e['peak_traced'] is not None:
+            s['peak_traced'] = max(s['peak_traced'] or 0, e['peak_traced'])
+        if e['project'] is not None:
+            projects[e['project']] = projects.get(e['project'], 0.) + e['seconds']
+    return stages, projects
+
+def printprofile():
+    stages, projects = summary()
+    print("")
+    print("Profile:")
+    print("stage".ljust(10)+" |"+"count".rjust(6)+"errors".rjust(7)+"wall [s]".rjust(10)+"cpu [s]".rjust(10)+"max [s]".rjust(10)+"RSS [MB]".rjust(10)+"traced [MB]".rjust(12))
+    print(str("-").ljust(10, '-')+"--"+str("-").rjust(65, '-'))
+    for name, s in stages.items():
+        traced = "-" if s['peak_traced'] is None else "%.1f" % (s['peak_traced']/1024**2)
+        print(name.ljust(10)+" |"+str(s['count']).rjust(6)+str(s['errors']).rjust(7)+("%.3f" % s['seconds']).rjust(10)+("%.3f" % s['cpu']).rjust(10)
+              +("%.3f" % s['max']).rjust(10)+("%.1f" % (s['peak_rss']/1024**2)).rjust(10)+traced.rjust(12))
+    if len(projects) > 1:
+        print("")
+        ln = max(len("project"), max(len(p) for p in projects))
+        print("project".ljust(ln)+" |"+"wall [s]".rjust(10))
+        print(str("-").ljust(ln, '-')+"--"+str("-").rjust(10, '-'))
+        for p, seconds in sorted(projects.items(), key=lambda x: x[1], reverse=True):
+            print(p.ljust(ln)+" |"+("%.3f" % seconds).rjust(10))
+
+def writetrace(fn):
+    ### chrome trace event format (chrome://tracing, https://ui.perfetto.dev), one complete event per stage, times in microseconds;
+    ### perf_counter is a system wide monotonic clock, so events of worker processes line up
+    origin = min((e['start'] for e in events), default=0.)
+    trace = []
+    for e in events:
+        args = {k: e[k] for k in ('project', 'detail', 'cpu', 'peak_rss', 'peak_traced', 'error') if e[k] is not None}
+        trace.append({'name': e['name'] if e['detail'] is None else e['name']+": "+e['detail'], 'cat': 'stage', 'ph': 'X',
+                      'ts': (e['start']-origin)*1e6, 'dur': e['seconds']*1e6, 'pid': e['pid'], 'tid': e['tid'], 'args': args})
+    with open(fn, 'w') as f:
+        json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f)
+
+@contextlib.contextmanager
+def cprofile(fn=None):
+    ### cProfile of the block into fn (pstats format, e.g. python -m pstats fn or snakeviz fn), nothing without fn
+    if not fn:
+        yield
+        return
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(fn)
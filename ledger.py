@@ -0,0 +1,135 @@
+import os
+import sqlite3
+import numpy as np
+import aggregate
+import decode
+
+### persistent per-project ledger in sqlite, <ledgerdir>/ledger_<project>.sqlite
+###   rows:      one row per export row, keyed by entry date, employee number and the position of the row among the rows
+###              of that employee on that day; amounts in øre, days since 1970-01-01
+###   months, weeks: employee rollups (months since 1970-01, consecutive ISO week numbers, see aggregate.weeknumbers),
+###              updated by the difference of every new, corrected or removed row
+###   employees: employee numbers and the last name seen
+### ingesting compares only the rows of the export's date range from lookback days before the last ledger day on, so a daily
+### refresh costs work proportional to the new rows; older rows are compared as well when their count or total differs from
+### the ledger (backdated or corrected entries); rows outside the export's date range are kept, ingesting the same export
+### twice changes nothing
+
+lookback = 31
+
+schema = """
+create table if not exists rows (key text primary key, day integer, employee text, amount integer);
+create index if not exists rows_day on rows (day);
+create table if not exists months (employee text, month integer, amount integer, primary key (employee, month));
+create table if not exists weeks (employee text, week integer, amount integer, primary key (employee, week));
+create table if not exists employees (employee text primary key, name text, position integer);
+"""
+
+def ledgername(ledgerdir, project):
+    return os.path.join(ledgerdir, 'ledger_'+str(project)+'.sqlite')
+
+def connect(ledgerdir, project):
+    os.makedirs(ledgerdir, exist_ok=True)
+    db = sqlite3.connect(ledgername(ledgerdir, project))
+    db.executescript(schema)
+    return db
+
+def rowkeys(table, rows):
+    ### "<day>:<employee number>:<k>" for the k-th row of an employee on a day, in export order
+    days = table['days'][table['date'][rows]].astype(np.int64)
+    employees = table['employee'][rows].astype(np.int64)
+    order = np.lexsort((np.arange(len(rows)), employees, days))
+    group = np.r_[True, (np.diff(days[order]) != 0) | (np.diff(employees[order]) != 0)]
+    starts = np.flatnonzero(group)
+    position = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+    k = np.empty(len(order), dtype=np.int64)
+    k[order] = position
+    numbers = [str(n) for n in table['numbers']]
+    return [str(d)+":"+numbers[e]+":"+str(i) for d, e, i in zip(days.tolist(), employees.tolist(), k.tolist())]
+
+def _rollup(db, changes):
+    ### changes: (employee, day, amount difference)
+    months = {}
+    weeks = {}
+    if not changes:
+        return
+    employees, days, deltas = zip(*changes)
+    days = np.array(days, dtype='datetime64[D]')
+    for employee, month, week, delta in zip(employees, days.astype('datetime64[M]').astype(np.int64).tolist(),
+                                            aggregate.weeknumbers(days).tolist(), deltas):
+        months[employee, month] = months.get((employee, month), 0) + delta
+        weeks[employee, week] = weeks.get((employee, week), 0) + delta
+    db.executemany("insert into months values (?, ?, ?) on conflict (employee, month) do update set amount = amount + excluded.amount",
+                   [(e, m, d) for (e, m), d in months.items()])
+    db.executemany("insert into weeks values (?, ?, ?) on conflict (employee, week) do update set amount = amount + excluded.amount",
+                   [(e, w, d) for (e, w), d in weeks.items()])
+
+def ingest(db, table, lookback=lookback):
+    ### new, corrected and removed rows in the export's date range; returns their counts
+    if len(table['billing']) == 0:
+        return {'new': 0, 'corrected': 0, 'removed': 0}
+    days = table['days'][table['date']].astype(np.int64)
+    first = int(days.min())
+    lastday = int(days.max())
+    last = db.execute("select max(day) from rows").fetchone()[0]
+    horizon = first if last is None else max(last - lookback, first)
+    if horizon > first:
+        older = days < horizon
+        stored = db.execute("select count(*), coalesce(sum(amount), 0) from rows where day >= ? and day < ?", (first, horizon)).fetchone()
+        if stored != (int(older.sum()), int(table['billing'][older].sum())):
+            horizon = first
+    rows = np.flatnonzero(days >= horizon)
+    keys = rowkeys(table, rows)
+    numbers = [str(n) for n in table['numbers']]
+    employees = [numbers[e] for e in table['employee'][rows].tolist()]
+    amounts = table['billing'][rows].tolist()
+    rowdays = days[rows].tolist()
+
+    stored = {key: (day, employee, amount) for key, day, employee, amount in
+              db.execute("select key, day, employee, amount from rows where day >= ? and day <= ?", (horizon, lastday))}
+    new = []
+    corrected = []
+    changes = []
+    for key, day, employee, amount in zip(keys, rowdays, employees, amounts):
+        old = stored.pop(key, None)
+        if old is None:
+            new.append((key, day, employee, amount))
+            changes.append((employee, day, amount))
+        elif old[2] != amount:
+            corrected.append((amount, key))
+            changes.append((employee, day, amount - old[2]))
+    removed = [(key,) for key in stored]
+    changes += [(employee, day, -amount) for day, employee, amount in stored.values()]
+
+    with db:
+        db.executemany("insert into rows values (?, ?, ?, ?)", new)
+        db.executemany("update rows set amount = ? where key = ?", corrected)
+        db.executemany("delete from rows where key = ?", removed)
+        _rollup(db, changes)
+        ### employees in order of first appearance, the last name seen wins
+        position = db.execute("select count(*) from employees").fetchone()[0]
+        db.executemany("insert into employees values (?, ?, ?) on conflict (employee) do update set name = excluded.name",
+                       [(n, name, position+k) for k, (n, name) in enumerate(zip(numbers, table['names']))])
+    return {'new': len(new), 'corrected': len(corrected), 'removed': len(removed)}
+
+def periods(db):
+    ### the rollups as aggregate.aggregate(table) would compute them from all ledger rows, with the employees of the ledger
+    employees = db.execute("select employee, name from employees order by position").fetchall()
+    index = {employee: k for k, (employee, _) in enumerate(employees)}
+    first, last = db.execute("select min(day), max(day) from rows").fetchone()
+    if first is None:
+        return None
+    result = aggregate.periodindex(np.array([first, last], dtype='datetime64[D]'))
+    by_month = np.zeros((len(employees), result['num_months']))
+    first_month = result['first_month'].astype(np.int64)
+    for employee, month, amount in db.execute("select employee, month, amount from months where amount != 0"):
+        by_month[index[employee], month - first_month] = amount
+    by_week = np.zeros((len(employees), result['num_weeks']))
+    for employee, week, amount in db.execute("select employee, week, amount from weeks where amount != 0"):
+        by_week[index[employee], week - result['first_week']] = amount
+    result['by_month'] = by_month/decode.subunits
+    result['by_week'] = by_week/decode.subunits
+    result['by_year'] = by_month.sum(axis=1)/decode.subunits
+    result['numbers'] = [employee for employee, _ in employees]
+    result['names'] = [name for _, name in employees]
+    return result
@@ -0,0 +1,169 @@
+import os
+import atexit
+import random
+import asyncio
+import functools
+import tempfile
+import threading
+import subprocess
+import instrument
+
+### maconomy requests: downloads and total budgets with a timeout, retries with exponential backoff on transient errors
+### and at most jobs requests at a time
+###   fetch(projectnumber, output_file, start, end) and budget(projectnumber) -> KNOK are blocking functions, sintefpy.projectdata.fetch
+###   and plotprojectdata.getbudget or a local stand-in (benchmarks/fakemaconomy.py), optionally wrapped by the download cache
+###   fetch runs in this process with the sintefpy session of the process
+###   every attempt runs on a daemon thread of its own that takes one of jobs slots of the process before the timeout starts,
+###   so jobs bounds the requests of all event loops, e.g. of all requests of the report server; a timed out attempt frees its
+###   slot and is given up without being interrupted and does not keep the process from exiting
+###   downloads go to a temporary file per attempt that replaces output_file when complete unless the attempt was given up,
+###   so a given up attempt that is still running never writes into the file of its retry; getbudget takes a timeout of its
+###   own for spy
+
+### network errors and timeouts; errors such as a missing spy, missing permissions or an unknown project are not retried
+### asyncio.TimeoutError of wait_for is TimeoutError only from python 3.11 on
+transient = (ConnectionError, TimeoutError, asyncio.TimeoutError, subprocess.TimeoutExpired)
+try:
+    import requests
+    ### sintefpy uses requests, whose connection errors are no builtin ConnectionErrors
+    transient += (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+except ImportError:
+    pass
+
+def _attempt(name, projectnumber, attempt, function, *args, **kwargs):
+    with instrument.stage(name, projectnumber, None if attempt == 0 else 'retry '+str(attempt)):
+        return function(*args, **kwargs)
+
+### temporary files of running downloads, removed at exit if their attempt is still hanging
+_downloads = set()
+
+@atexit.register
+def _removedownloads():
+    for tmp in list(_downloads):
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+def _fetchinto(fetch, projectnumber, output_file, start, end):
+    ### the temporary file of a download, see _keepdownload
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(output_file)+'.', suffix='.tmp', dir=os.path.dirname(output_file) or '.')
+    os.close(fd)
+    _downloads.add(tmp)
+    try:
+        fetch(projectnumber, output_file=tmp, start=start, end=end)
+    except BaseException:
+        _downloads.discard(tmp)
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return tmp
+
+def _keepdownload(output_file, tmp, current):
+    ### the download of an attempt that was given up is removed instead of replacing the download of its retry
+    try:
+        if current:
+            os.replace(tmp, output_file)
+        else:
+            os.remove(tmp)
+    finally:
+        _downloads.discard(tmp)
+    return output_file
+
+def _post(loop, future, result, error):
+    def done():
+        if not future.done():
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+    try:
+        loop.call_soon_threadsafe(done)
+    except RuntimeError:
+        ### the event loop is gone, the attempt was given up long ago
+        pass
+
+def _ondaemon(loop, slots, finish, function, *args, **kwargs):
+    ### (started, result, giveup) of function(*args, **kwargs) on a daemon thread once it holds one of slots: futures of taking
+    ### the slot and of the result, and a function that gives the attempt up and frees its slot if it still holds it;
+    ### finish(value, current), if given, makes the result of the attempt, current is False once it was given up
+    started = loop.create_future()
+    result = loop.create_future()
+    lock = threading.Lock()
+    state = {'holding': False, 'givenup': False}
+
+    def release():
+        with lock:
+            if state['holding']:
+                state['holding'] = False
+                slots.release()
+
+    def giveup():
+        with lock:
+            state['givenup'] = True
+        release()
+
+    def run():
+        slots.acquire()
+        with lock:
+            if state['givenup']:
+                slots.release()
+                return
+            state['holding'] = True
+        _post(loop, started, None, None)
+        value = error = None
+        try:
+            value = function(*args, **kwargs)
+            if finish is not None:
+                with lock:
+                    value = finish(value, not state['givenup'])
+        except BaseException as e:
+            error = e
+        release()
+        _post(loop, result, value, error)
+
+    threading.Thread(target=run, daemon=True).start()
+    return started, result, giveup
+
+class Maconomy:
+    def __init__(self, fetch, budget, jobs=8, timeout=600, retries=3, backoff=1., transient=transient):
+        self.fetch = fetch
+        self.getbudget = budget
+        self.jobs = jobs
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.transient = transient
+        self.slots = threading.BoundedSemaphore(jobs)
+
+    async def request(self, name, projectnumber, function, *args, finish=None, **kwargs):
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.retries+1):
+            started, call, giveup = _ondaemon(loop, self.slots, finish, _attempt, name, projectnumber, attempt, function, *args, **kwargs)
+            try:
+                try:
+                    await started
+                    return await asyncio.wait_for(call, self.timeout)
+                finally:
+                    giveup()
+            except self.transient as e:
+                if attempt == self.retries:
+                    raise
+                ### full jitter, so projects failing together do not retry together
+                delay = random.uniform(0, self.backoff*2**attempt)
+                print(name, projectnumber, "failed ("+(str(e) or type(e).__name__)+"), retrying in %.1f s" % delay, flush=True)
+                await asyncio.sleep(delay)
+
+    async def data(self, projectnumber, output_file, start=None, end=None):
+        return await self.request('fetch', projectnumber, _fetchinto, self.fetch, projectnumber, output_file, start, end,
+                                  finish=functools.partial(_keepdownload, output_file))
+
+    async def budget(self, projectnumber):
+        return await self.request('budget', projectnumber, self.getbudget, projectnumber)
+
+    async def _project(self, projectnumber, output_file, start, end, budget):
+        if not budget:
+            return await self.data(projectnumber, output_file, start, end), None
+        return tuple(await asyncio.gather(self.data(projectnumber, output_file, start, end), self.budget(projectnumber)))
+
+    def project(self, projectnumber, output_file, start=None, end=None, budget=True):
+        ### blocking: (export file, total budget or None) of one project, downloaded together
+        return asyncio.run(self._project(projectnumber, output_file, start, end, budget))
@@ -1,213 +1,287 @@
 import os
+import io
+import sys
+import csv
+import locale
 import subprocess
+import tempfile
+import asyncio
 import argparse
+import contextlib
 import datetime
+import functools
+from concurrent.futures import ProcessPoolExecutor
+from array import array
 import numpy as np
-import matplotlib.pyplot as plt 
-from scipy.optimize import curve_fit
+import aggregate
+import cache
+import snapshot
+import forecast
+import rollup
+import instrument
+import decode
+import readers
 
 delimiter = ";"
 
+### column names of the Maconomy export layouts: downloads (ssv), manual csv and xlsx exports
+columns_ssv = {'date': 'entrydate', 'number': 'employeenumber', 'name': 'employeenamevar', 'billing': 'billingpriceregcurrency'}
+columns_csv = {'date': 'Entry Date', 'number': 'Empl. No.', 'name': 'Empl. Name', 'billing': 'Billing Price'}
+columns_xlsx = {'date': 'Date', 'number': 'Employee No.', 'name': 'Employee Name', 'billing': 'Billing Price, Reg.'}
+
 def linear_func(x, a, b):
     return a + b * x
 
-def getbillingprice(wbs):
-    data_dict={}
-
-    found=0
-    for i in range(1,wbs.max_column+1):
-        string=wbs.cell(1,i).value
-        if string == "Billing Price, Reg.":
-            billing_index=i
-            found+=1
-        if string == "Date":
-            date_index=i
-            found+=1
-        if found==2:
-            break
-    for i in range(2,wbs.max_row+1):
-        datestr=wbs.cell(i,date_index).value
-        date = datetime.datetime.strptime(datestr.replace("=Date(","").replace(")",""), "%Y,%m,%d")
-        datestr = str(date.day)+"."+str(date.month)+"."+str(date.year)
-
-        valuestr=wbs.cell(i,billing_index).value
-        value = float(valuestr.replace("=", "").replace(",", "."))
-
-        if datestr in data_dict:
-            data_dict[datestr] += value
-        else:
-            data_dict[datestr] = value
-    return data_dict
-
-def getbillingprice_ssv(fn):
-    data={}
-    'date'
-    with open(fn) as csv_file:
-        csv_reader = csv.reader(csv_file, delimiter=delimiter)
-        line_count = 0
-        for row in csv_reader:
-            if line_count == 0:
-                billing_index=row.index('billingpriceregcurrency')
-                date_index=row.index('entrydate')
-            else:
-                if row[date_index] in data:
-                    data[row[date_index]] += int(row[billing_index].replace(" ", "").split(".", 1)[0])
-                else:
-                    data[row[date_index]] = int(row[billing_index].replace(" ", "").split(".", 1)[0])
-            line_count += 1
-    return data
-
-
-def getbillingprice_csv(fn):
-    data={}
-    'Date'
-    with open(fn) as csv_file:
-        csv_reader = csv.reader(csv_file, delimiter=delimiter)
-        line_count = 0
-        for row in csv_reader:
-            if line_count == 0:
-                billing_index=row.index('Billing Price')
-                date_index=row.index('Entry Date')
-            else:
-                if row[date_index] in data:
-                    data[row[date_index]] += int(row[billing_index].replace(" ", "").split(",", 1)[0])
-                else:
-                    data[row[date_index]] = int(row[billing_index].replace(" ", "").split(",", 1)[0])
-            line_count += 1
-    return data
-
-def getemployees(wbs):
-    data_dict={}
-
-    found=0
-    for i in range(1,wbs.max_column+1):
-        string=wbs.cell(1,i).value
-        if string == "Employee No.":
-            emplno_index=i
-            found+=1
-        if string == "Employee Name":
-            emplname_index=i
-            found+=1
-        if found==2:
-            break
-    for i in range(2,wbs.max_row+1):
-        number=wbs.cell(i,emplno_index).value
-        name=wbs.cell(i,emplname_index).value
-        if name=='':
-            name="other"
-        data_dict[number] = name
-    return data_dict
-
-def getemployees_ssv(fn):
-    data={}
-    with open(fn) as csv_file:
-        csv_reader = csv.reader(csv_file, delimiter=delimiter)
-        line_count = 0
-        for row in csv_reader:
-            if line_count == 0:
-                emplno_index=row.index('employeenumber')
-                emplname_index=row.index('employeenamevar')
-            else:
-                name=str(row[emplname_index])
-                if name=='':
-                    name="other"
-                data[row[emplno_index]] = name
-            line_count += 1
-    return data
-
-
-def getemployees_csv(fn):
-    data={}
-    with open(fn) as csv_file:
-        csv_reader = csv.reader(csv_file, delimiter=delimiter)
-        line_count = 0
-        for row in csv_reader:
-            if line_count == 0:
-                emplno_index=row.index('Empl. No.')
-                emplname_index=row.index('Empl. Name')
-            else:
-                name=str(row[emplname_index])
-                if name=='':
-                    name="other"
-                data[row[emplno_index]] = name
-            line_count += 1
-    return data
-
-def getemployeesbillingprice(employees_by_number, wbs):
-    data_dict={}
-
-    for key in employees_by_number:
-        data_dict[key]={}
-
-    found=0
-    for i in range(1,wbs.max_column+1):
-        string=wbs.cell(1,i).value
-        if string == "Employee No.":
-            emplno_index=i
-            found+=1
-        if string == "Billing Price, Reg.":
-            billing_index=i
-            found+=1
-        if string == "Date":
-            date_index=i
-            found+=1
-        if found==3:
-            break
-    for i in range(2,wbs.max_row+1):
-        datestr=wbs.cell(i,date_index).value
-        date = datetime.datetime.strptime(datestr.replace("=Date(","").replace(")",""), "%Y,%m,%d")
-        datestr = str(date.day)+"."+str(date.month)+"."+str(date.year)
-
-        valuestr=wbs.cell(i,billing_index).value
-        value = float(valuestr.replace("=", "").replace(",", "."))
-
-        number=wbs.cell(i,emplno_index).value
-
-        if datestr in data_dict[number]:
-            data_dict[number][datestr] += value
-        else:
-            data_dict[number][datestr] = value
-    return data_dict
-
-def getemployeesbillingprice_csv(employees_by_number, fn):
-    data={}
-    for key in employees_by_number:
-        data[key]={}
-    with open(fn) as csv_file:
-        csv_reader = csv.reader(csv_file, delimiter=delimiter)
-        line_count = 0
-        for row in csv_reader:
-            if line_count == 0:
-                emplno_index=row.index('Empl. No.')
-                billing_index=row.index('Billing Price')
-                date_index=row.index('Entry Date')
-            else:
-                if row[date_index] in data[row[emplno_index]]:
-                    data[row[emplno_index]][row[date_index]] += int(row[billing_index].replace(" ", "").split(",", 1)[0])
-                else:
-                    data[row[emplno_index]][row[date_index]] = int(row[billing_index].replace(" ", "").split(",", 1)[0])
-            line_count += 1
-    return data
-
-
-def getemployeesbillingprice_ssv(employees_by_number, fn):
-    data={}
-    for key in employees_by_number:
-        data[key]={}
-    with open(fn) as csv_file:
+### the billing table is filled in a single pass over the export and holds one entry per row:
+###   table['date'], table['employee']: integer codes into table['days'] (datetime64[D]) and table['numbers']/table['names'],
+###     the smallest unsigned type that holds all codes
+###   table['billing']: exact billing amount in øre (int64), see decode.py
+### employee names are interned, so the tables of a portfolio share them
+### amounts are collected as raw strings and decoded in chunks of chunksize rows to keep memory bounded
+chunksize = 65536
+
+def _codes(codes, n):
+    return np.array(codes, dtype=np.uint16 if n <= np.iinfo(np.uint16).max+1 else np.int32)
+
+def _billingtable(days, numbers, names, date_codes, employee_codes, billings):
+    ### billings: list of decoded chunks
+    return {
+        'days': np.asarray(days, dtype='datetime64[D]'),
+        'numbers': numbers,
+        'names': [sys.intern(name) for name in names],
+        'date': _codes(date_codes, len(days)),
+        'employee': _codes(employee_codes, len(numbers)),
+        'billing': np.concatenate(billings) if billings else np.zeros(0, dtype=np.int64),
+    }
+
+def _readrows(csv_reader, indices, decimal, width=None):
+    ### one pass over the rows: (dates, numbers, names, date codes, employee codes, decoded billing chunks),
+    ### None if width is given and a row has another number of fields
+    date_index, emplno_index, emplname_index, billing_index = indices
+    date_index_by_str = {}
+    employee_index_by_number = {}
+    dates = []
+    numbers = []
+    names = []
+    date_codes = array('i')
+    employee_codes = array('i')
+    billings = []
+    chunk = []
+    for row in csv_reader:
+        if width is not None and len(row) != width:
+            return None
+        datestr = row[date_index]
+        code = date_index_by_str.get(datestr)
+        if code is None:
+            code = date_index_by_str[datestr] = len(dates)
+            dates.append(datestr)
+        date_codes.append(code)
+
+        number = row[emplno_index]
+        code = employee_index_by_number.get(number)
+        if code is None:
+            code = employee_index_by_number[number] = len(numbers)
+            numbers.append(number)
+            names.append(None)
+        employee_codes.append(code)
+        ### the last name seen for an employee number wins
+        name = row[emplname_index]
+        names[code] = name if name else "other"
+
+        chunk.append(row[billing_index])
+        if len(chunk) == chunksize:
+            billings.append(decode.decodeamounts(chunk, decimal))
+            chunk = []
+    if chunk:
+        billings.append(decode.decodeamounts(chunk, decimal))
+    return dates, numbers, names, date_codes, employee_codes, billings
+
+def _indices(header, columns):
+    return [header.index(columns[c]) for c in ('date', 'number', 'name', 'billing')]
+
+def _getbillingtable_delimited(fn, columns, decimal, delimiter=delimiter, dateformat=None, encoding=None):
+    with open(fn, newline='', encoding=encoding) as csv_file:
         csv_reader = csv.reader(csv_file, delimiter=delimiter)
-        line_count = 0
-        for row in csv_reader:
-            if line_count == 0:
-                emplno_index=row.index('employeenumber')
-                billing_index=row.index('billingpriceregcurrency')
-                date_index=row.index('entrydate')
-            else:
-                if row[date_index] in data[row[emplno_index]]:
-                    data[row[emplno_index]][row[date_index]] += int(row[billing_index].replace(" ", "").split(".", 1)[0])
-                else:
-                    data[row[emplno_index]][row[date_index]] = int(row[billing_index].replace(" ", "").split(".", 1)[0])
-            line_count += 1
+        header = next(csv_reader)
+        dates, numbers, names, date_codes, employee_codes, billings = _readrows(csv_reader, _indices(header, columns), decimal)
+    return _billingtable(decode.decodedates(dates, dateformat), numbers, names, date_codes, employee_codes, billings)
+
+### chunked parsing of large delimited exports: the rows after the header are split into byte ranges on line boundaries,
+### each range is parsed by a worker process and the parts are merged in file order, so codes are numbered by first
+### appearance and the last name seen wins exactly as in a single pass;
+### a quoted field with a line break can be cut by a boundary, such exports are detected by the field count and parsed in a single pass
+chunked_minsize = 8*1024**2
+
+def _chunkranges(fn, num_chunks):
+    ### (header line, [(start, end), ...]) byte ranges of whole lines after the header line
+    with open(fn, 'rb') as f:
+        headerline = f.readline()
+        size = os.fstat(f.fileno()).st_size
+        starts = [f.tell()]
+        for k in range(1, num_chunks):
+            f.seek(max(starts[-1], starts[0] + (size-starts[0])*k//num_chunks))
+            f.readline()
+            if f.tell() >= size:
+                break
+            if f.tell() > starts[-1]:
+                starts.append(f.tell())
+    return headerline, list(zip(starts, starts[1:]+[size]))
+
+def _readchunk(fn, start, end, indices, width, decimal, delimiter, encoding):
+    with open(fn, 'rb') as f:
+        f.seek(start)
+        text = f.read(end-start).decode(encoding)
+    return _readrows(csv.reader(io.StringIO(text, newline=''), delimiter=delimiter), indices, decimal, width)
+
+def _mergeparts(parts):
+    ### codes of every part are mapped to codes of the whole file, in order of first appearance
+    date_index_by_str = {}
+    employee_index_by_number = {}
+    dates = []
+    numbers = []
+    names = []
+    date_codes = []
+    employee_codes = []
+    billings = []
+    for pdates, pnumbers, pnames, pdate_codes, pemployee_codes, pbillings in parts:
+        dates_map = np.empty(len(pdates), dtype=np.int64)
+        for k, datestr in enumerate(pdates):
+            code = date_index_by_str.get(datestr)
+            if code is None:
+                code = date_index_by_str[datestr] = len(dates)
+                dates.append(datestr)
+            dates_map[k] = code
+        employees_map = np.empty(len(pnumbers), dtype=np.int64)
+        for k, (number, name) in enumerate(zip(pnumbers, pnames)):
+            code = employee_index_by_number.get(number)
+            if code is None:
+                code = employee_index_by_number[number] = len(numbers)
+                numbers.append(number)
+                names.append(None)
+            names[code] = name
+            employees_map[k] = code
+        date_codes.append(dates_map[np.frombuffer(pdate_codes, dtype=np.int32)])
+        employee_codes.append(employees_map[np.frombuffer(pemployee_codes, dtype=np.int32)])
+        billings.extend(pbillings)
+    return dates, numbers, names, np.concatenate(date_codes), np.concatenate(employee_codes), billings
+
+def getbillingtable_chunked(fn, columns, decimal, delimiter=delimiter, dateformat=None, encoding=None, processes=None):
+    processes = processes or os.cpu_count()
+    encoding = encoding or locale.getpreferredencoding(False)
+    headerline, ranges = _chunkranges(fn, processes)
+    header = next(csv.reader([headerline.decode(encoding)], delimiter=delimiter))
+    indices = _indices(header, columns)
+    with ProcessPoolExecutor(max_workers=processes, initializer=instrument.worker) as pool:
+        parts = list(pool.map(_readchunk, *zip(*[(fn, start, end, indices, len(header), decimal, delimiter, encoding) for start, end in ranges])))
+    if any(part is None for part in parts):
+        return _getbillingtable_delimited(fn, columns, decimal, delimiter, dateformat, encoding)
+    dates, numbers, names, date_codes, employee_codes, billings = _mergeparts(parts)
+    return _billingtable(decode.decodedates(dates, dateformat), numbers, names, date_codes, employee_codes, billings)
+
+def getbillingtable_ssv(fn):
+    return _getbillingtable_delimited(fn, columns_ssv, ".")
+
+def getbillingtable_csv(fn):
+    return _getbillingtable_delimited(fn, columns_csv, ",")
+
+### xlsx rows are streamed in read-only mode
+
+def _decodeamounts_xlsx(values):
+    ### "=123,45" formula strings or plain numbers
+    return decode.decodeamounts(["" if v is None else v if isinstance(v, str) else str(v).replace(".", ",") for v in values], ",")
+
+def _number_xlsx(value):
+    ### employee numbers are int (or float) cells in ExportProjectCard workbooks, strings as in the other exports
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+def _decodedates_xlsx(values):
+    ### "=Date(Y,M,D)" formula strings or datetime cells
+    return decode.decodedates([v.strftime("=Date(%Y,%m,%d)") if isinstance(v, datetime.datetime) else v for v in values])
+
+def getbillingtable_xlsx(fn, columns=None):
+    ### columns of the first registered xlsx layout that matches the header if not given
+    from openpyxl import load_workbook
+    wb = load_workbook(filename=fn, read_only=True)
+    wbs = wb[wb.sheetnames[0]]
+    rows = wbs.iter_rows(values_only=True)
+    header = list(next(rows))
+    if columns is None:
+        layout = readers.matchlayout(header, 'xlsx')
+        if layout is None:
+            wb.close()
+            raise NotImplementedError('unknown xlsx export layout: '+str(header)[:200])
+        columns = layout['columns']
+    date_index = header.index(columns['date'])
+    emplno_index = header.index(columns['number'])
+    emplname_index = header.index(columns['name'])
+    billing_index = header.index(columns['billing'])
+
+    date_index_by_value = {}
+    employee_index_by_number = {}
+    rawdates = []
+    numbers = []
+    names = []
+    date_codes = array('i')
+    employee_codes = array('i')
+    billings = []
+    chunk = []
+    for row in rows:
+        date = row[date_index]
+        if date is None:
+            continue
+        code = date_index_by_value.get(date)
+        if code is None:
+            code = date_index_by_value[date] = len(rawdates)
+            rawdates.append(date)
+        date_codes.append(code)
+
+        number = row[emplno_index]
+        code = employee_index_by_number.get(number)
+        if code is None:
+            ### 1001 and "1001" are the same employee
+            key = _number_xlsx(number)
+            code = employee_index_by_number.get(key)
+            if code is None:
+                code = len(numbers)
+                numbers.append(key)
+                names.append(None)
+            employee_index_by_number[number] = employee_index_by_number[key] = code
+        employee_codes.append(code)
+        name = row[emplname_index]
+        names[code] = name if name else "other"
+
+        chunk.append(row[billing_index])
+        if len(chunk) == chunksize:
+            billings.append(_decodeamounts_xlsx(chunk))
+            chunk = []
+    if chunk:
+        billings.append(_decodeamounts_xlsx(chunk))
+    wb.close()
+    return _billingtable(_decodedates_xlsx(rawdates), numbers, names, date_codes, employee_codes, billings)
+
+### results derived from the billing table
+
+def billingsbyday(table):
+    totals = np.bincount(table['date'], weights=table['billing'], minlength=len(table['days']))/decode.subunits
+    return dict(zip(table['days'].astype(str).tolist(), totals))
+
+def employeesbynumber(table):
+    return dict(zip(table['numbers'], table['names']))
+
+def employeesbillingsbyday(table):
+    dates = table['days'].astype(str).tolist()
+    numbers = table['numbers']
+    num_dates = len(dates)
+    key = table['employee'].astype(np.int64)*num_dates + table['date']
+    keys, first, inverse = np.unique(key, return_index=True, return_inverse=True)
+    totals = np.bincount(inverse.ravel(), weights=table['billing'], minlength=len(keys))/decode.subunits
+    ### per employee, days are kept in order of first appearance in the export
+    employees = keys // num_dates
+    data = {number: {} for number in numbers}
+    for k in np.lexsort((first, employees)):
+        data[numbers[employees[k]]][dates[keys[k] % num_dates]] = totals[k]
     return data
 
 def str2bool(v):
@@ -221,129 +295,84 @@ def str2bool(v):
         raise argparse.ArgumentTypeError('Boolean value expected.')
 
 
-if __name__ == "__main__":
-
-    parser = argparse.ArgumentParser(description='Parse and plot data')
-    parser.add_argument('--projectnumber', metavar='projectnumber', required=False, type=str, default='None', help='project number')
-    parser.add_argument('--filename', metavar='filename', required=False, type=str, help='name of cvs file')
-    parser.add_argument('--totalbudget', metavar='totalbudget', required=False, type=int, help='total budget in KNOK')
-    parser.add_argument('--regressionON', metavar='regressionON', type=str2bool, nargs='?', const=True, default=True, help='plot regression')
-    parser.add_argument('--startdate', metavar='startdate', required=False, type=str, default='None', help='start date in format dmY')
-    parser.add_argument('--enddate', metavar='enddate', required=False, type=str, default='None', help='end date in format dmY')
-    args = parser.parse_args()
+### maconomy downloads; fetch is sintefpy.projectdata.fetch or a stand-in with the same signature, see maconomy.py for requests
+### with timeouts and retries
 
+def downloadname(projectnumber):
+    return 'data_'+str(projectnumber)+'.csv'
 
-    if args.startdate is not 'None':
-        args.startdate = datetime.datetime.strptime(args.startdate, "%d%m%Y").date()
-    else:
-        args.startdate = None
-    if args.enddate is not 'None':
-        args.enddate = datetime.datetime.strptime(args.enddate, "%d%m%Y").date()
-    else:
-        args.enddate = None
+def download(projectnumber, startdate, enddate, fetch):
+    filename = downloadname(projectnumber)
+    fetch(projectnumber, output_file=filename, start=startdate, end=enddate)
+    return filename
 
-    if args.projectnumber is not 'None':
-        import csv
-        from sintefpy.projectdata import fetch
-        print("Downloading data from maconomy...", end=" ", flush=True)
-        filename='data_'+str(args.projectnumber)+'.csv'
-        dn = fetch(args.projectnumber, output_file=filename, start=args.startdate, end=args.enddate)
-        if not args.totalbudget:
-            subprocess.check_call(['spy', 'project', 'get-budget', '-p', str(args.projectnumber)], stdout=subprocess.DEVNULL)
-
-            bfname='budget_'+str(args.projectnumber)+'.csv'
-            print(bfname)
-            with open(bfname) as csv_file:
-                csv_reader = csv.reader(csv_file, delimiter=delimiter)
-                line_count = 0
-                for row in csv_reader:
-                    if row[0]=="Total":
-                        if len(row)<2:
-                            print("no total budget specified")
-                        else:
-                            args.totalbudget=int(float(row[1])/1000)
-        print("done.")
-        billings_by_day = getbillingprice_ssv(filename)
-        ### there might be two people with the exact name, we need to use the Empl. No.
-        employees_by_number = getemployees_ssv(filename)
-        billings_by_employees_by_day = getemployeesbillingprice_ssv(employees_by_number, filename)
+def readbudget(bfname):
+    totalbudget = None
+    with open(bfname) as csv_file:
+        csv_reader = csv.reader(csv_file, delimiter=delimiter)
+        for row in csv_reader:
+            if row and row[0]=="Total":
+                if len(row)<2:
+                    print("no total budget specified")
+                else:
+                    totalbudget=int(float(row[1])/1000)
+    return totalbudget
+
+def getbudget(projectnumber, spy=('spy',), timeout=None):
+    ### total budget in KNOK as written to budget_<projectnumber>.csv by "spy project get-budget", spy is killed after timeout seconds
+    subprocess.check_call(list(spy)+['project', 'get-budget', '-p', str(projectnumber)], stdout=subprocess.DEVNULL, timeout=timeout)
+    return readbudget('budget_'+str(projectnumber)+'.csv')
+
+### readers of the registered layouts, see readers.py
+readers.registerlayout('ssv', columns_ssv, 'delimited', '.')
+readers.registerlayout('csv', columns_csv, 'delimited', ',')
+readers.registerlayout('xlsx', columns_xlsx, 'xlsx', ',')
+def _readdelimited(fn, dialect):
+    if dialect['processes'] > 1 and os.path.getsize(fn) >= chunked_minsize:
+        return getbillingtable_chunked(fn, dialect['layout']['columns'], dialect['decimal'], dialect['delimiter'], dialect['dateformat'], dialect['encoding'], dialect['processes'])
+    return _getbillingtable_delimited(fn, dialect['layout']['columns'], dialect['decimal'], dialect['delimiter'], dialect['dateformat'], dialect['encoding'])
+
+def _readxlsx(fn, dialect):
+    return getbillingtable_xlsx(fn)
+
+readers.registerreader('delimited', _readdelimited)
+readers.registerreader('xlsx', _readxlsx)
+
+def getbillingtable_file(fn, processes=1):
+    ### any export, its layout is sniffed from the start of the file; large delimited exports are parsed in chunks on processes workers
+    return readers.read(fn, processes)
+
+def loadbillingtable(fn, parse, snapshots=True):
+    ### parse(fn) unless an up to date binary snapshot of fn exists
+    if snapshots:
+        return snapshot.loadorparse(fn, parse)
+    return parse(fn)
+
+### aggregates of one project for figures, tables and exports
+###   months and ISO weeks run over all years of the project, see aggregate.periodindex
+def summarize(table, totalbudget, regressionON, window=None, cube=None, periods=None):
+
+    ### window: (startdate, enddate), either None for open, answered from the rollup cube without re-reading the rows
+    ### periods: aggregates kept elsewhere together with their employees (numbers, names), e.g. ledger.periods, used without a window
+    if window is not None:
+        periods = rollup.aggregate_window(rollup.buildrollup(table) if cube is None else cube, *window)
+    elif periods is not None:
+        table = periods
     else:
-        _, fext = os.path.splitext(args.filename)
-        if fext=='.csv':
-            import csv
-            billings_by_day = getbillingprice_csv(args.filename)
-            ### there might be two people with the exact name, we need to use the Empl. No.
-            employees_by_number = getemployees_csv(args.filename)
-            billings_by_employees_by_day = getemployeesbillingprice_csv(employees_by_number, args.filename)
-        elif fext=='.xlsx':
-            from openpyxl import load_workbook
-            wb = load_workbook(filename=args.filename)
-            wbs = wb[wb.sheetnames[0]]
-
-            print("Reading billing prices...", end=" ", flush=True)
-            billings_by_day = getbillingprice(wbs)
-            print("done.")
-            print("Reading employees...", end=" ", flush=True)
-            ### there might be two people with the exact name, we need to use the Empl. No.
-            employees_by_number = getemployees(wbs)
-            print("done.")
-            print("Reading billings by employees...", end=" ", flush=True)
-            billings_by_employees_by_day = getemployeesbillingprice(employees_by_number, wbs)
-            print("done.")
-            wb.close()
-        else:
-            raise NotImplementedError
+        periods = aggregate.aggregate(table)
+    by_month = periods['by_month']
+    by_week = periods['by_week']
+    by_year = periods['by_year']
+    num_months = periods['num_months']
+    num_weeks = periods['num_weeks']
 
-### if the project is from a past year, set month to 12 and week to number of weeks that year
-    today = datetime.datetime.today()
-    this_week=today.isocalendar()[1]
-    this_month=today.month
-    this_year=today.year
+### actuals are accumulated up to the current month and week, or over all periods if the project is in the past
+    today = np.datetime64(datetime.date.today())
+    month = int(np.clip(aggregate.monthindices(today, periods)+1, 0, num_months))
+    week = int(np.clip(aggregate.weekindices(today, periods)+1, 0, num_weeks))
 
-    datestr = list(billings_by_day.keys())[0]
-    if True:
-        file_date = datetime.datetime.strptime(datestr, "%Y-%m-%d")
-    else:
-        file_date = datetime.datetime.strptime(datestr, "%d.%m.%Y")
-
-    ### any date from the file will suffice
-    if this_year > file_date.year:
-        year = file_date.year
-        month = 12
-        week = datetime.date(file_date.year, 12, 29).isocalendar()[1]
-    else:
-        year = this_year
-        month = this_month
-        week = this_week
-
-    num_weeks = datetime.date(year, 12, 29).isocalendar()[1]
-
-
-    billings_by_employees_by_year = {}
-    billings_by_employees_by_month = {}
-    billings_by_employees_by_week = {}
-    for employeenr, billings in billings_by_employees_by_day.items():
-        billings_by_employees_by_year[employeenr] = 0
-        billings_by_employees_by_month[employeenr] = np.zeros(12)
-        billings_by_employees_by_week[employeenr] = np.zeros(num_weeks)
-        for billingday, value in billings.items():
-            billings_by_employees_by_year[employeenr] += value
-            if True:
-                date = datetime.datetime.strptime(billingday, "%Y-%m-%d")
-            else:
-                date = datetime.datetime.strptime(billingday, "%d.%m.%Y")
-            billings_by_employees_by_month[employeenr][date.month-1] += value
-            billings_by_employees_by_week[employeenr][date.isocalendar()[1]-1] += value
-
-    billings_by_month = np.zeros(12)
-    billings_by_week = np.zeros(num_weeks)
-    for billingday, billings in billings_by_day.items():
-        if True:
-            date = datetime.datetime.strptime(billingday, "%Y-%m-%d")
-        else:
-            date = datetime.datetime.strptime(billingday, "%d.%m.%Y")
-        billings_by_month[date.month-1] += billings
-        billings_by_week[date.isocalendar()[1]-1] += billings
+    billings_by_month = by_month.sum(axis=0)
+    billings_by_week = by_week.sum(axis=0)
 
     cumsum_billings_by_month=np.cumsum(billings_by_month)
     cumsum_billings_by_month[month:] = 0
@@ -351,293 +380,525 @@ if __name__ == "__main__":
     cumsum_billings_by_week=np.cumsum(billings_by_week)
     cumsum_billings_by_week[week:] = 0
 
+    ### burn-rate forecast for the project and all employees in one batch; employees have no budget of their own
+    forecasts = None
+    if regressionON and month>2:
+        accumulated = np.vstack([cumsum_billings_by_month, np.cumsum(by_month, axis=1)])
+        budgets = np.full(len(accumulated), np.nan)
+        if totalbudget:
+            budgets[0] = totalbudget*1000
+        forecasts = forecast.forecast(accumulated, month, num_months, budgets, periods['first_year'])
 
-    labels_month=('Jan','Feb','Mar','Apr','Mai','Jun','Jul','Aug','Sep','Oct','Nov','Des')
+    summary = {
+        ### there might be two people with the exact name, we need to use the Empl. No.
+        'numbers': table['numbers'],
+        'names': table['names'],
+        'periods': periods,
+        'month': month,
+        'week': week,
+        'num_months': num_months,
+        'num_weeks': num_weeks,
+        'regression': regressionON,
+        'billings_by_employees_by_month': by_month,
+        'billings_by_employees_by_week': by_week,
+        'billings_by_employees_by_year': by_year,
+        'billings_by_month': billings_by_month,
+        'billings_by_week': billings_by_week,
+        'cumsum_billings_by_month': cumsum_billings_by_month,
+        'cumsum_billings_by_week': cumsum_billings_by_week,
+        'used': np.sum(by_year),
+        'totalbudget': totalbudget,
+    }
+    if forecasts is not None:
+        summary['regression_month'] = (forecasts['intercept'][0], forecasts['slope'][0])
+        summary['projected'] = forecasts['projected'][0]
+        summary['exhaustion'] = forecasts['exhaustion'][0]
+        summary['projected_by_employee'] = forecasts['projected'][1:]
+    return summary
+
+labels_month=('Jan','Feb','Mar','Apr','Mai','Jun','Jul','Aug','Sep','Oct','Nov','Des')
+
+def periodticks(periods, period):
+    ### tick keyword arguments for figures.barchart/stackedbarchart; a single year keeps the month names and automatic week ticks
+    if period == 'month':
+        if periods['num_years'] == 1:
+            return {'xticklabels': labels_month}
+        years, months = aggregate.monthkeys(periods)
+        quarters = np.flatnonzero((months-1) % 3 == 0)
+        return {'xticks': quarters+1, 'xticklabels': [labels_month[months[i]-1]+("\n"+str(years[i]) if months[i]==1 else "") for i in quarters]}
+    if periods['num_years'] == 1:
+        return {}
+    years, weeks = aggregate.weekkeys(periods)
+    first = np.flatnonzero(weeks == 1)
+    return {'xticks': first+1, 'xticklabels': ["W1\n"+str(years[i]) for i in first]}
+
+### figure jobs of one project into outdir, see figures.py
+### figures show the top contributors by billings and one "other" series for the rest, so drawing and legends stay the same size
+### however many employees a project has; 0 for all
+topemployees = 15
+
+def groupemployees(rows, names, totals, top):
+    ### rows (per employee) of the top employees by totals in employee order, followed by the sum of the rest
+    if not top or len(names) <= top:
+        return rows, list(names)
+    keep = np.sort(np.argsort(-totals, kind='stable')[:top])
+    rest = np.ones(len(names), dtype=bool)
+    rest[keep] = False
+    return (np.concatenate([rows[keep], rows[rest].sum(axis=0, keepdims=True)]),
+            [names[k] for k in keep]+["other (%d employees)" % rest.sum()])
+
+def figurejobs(summary, outdir=".", ext=".png", top=None, names=None):
+    ### names: only the figures of these file names (without ext), all if None
+    import figures
+    top = topemployees if top is None else top
+    month = summary['month']
+    week = summary['week']
+    num_months = summary['num_months']
+    num_weeks = summary['num_weeks']
+    monthticks = periodticks(summary['periods'], 'month')
+    weekticks = periodticks(summary['periods'], 'week')
+    totalbudget = summary['totalbudget']
+    totals = summary['billings_by_employees_by_year']
+    pie_sizes, employeenames = groupemployees(totals, summary['names'], totals, top)
+    usedbudget = summary['used']
+
+    jobs = []
+    def addjob(function, text, basename=None, **kwargs):
+        basename = text if basename is None else basename
+        if names is None or basename in names:
+            jobs.append((function, dict(fname=os.path.join(outdir, basename+ext), text=text, **kwargs)))
+
+    if 'regression_month' in summary:
+        popt = summary['regression_month']
+        regression_month = [(np.arange(1,num_months+1),linear_func(np.arange(1,num_months+1), popt[0], popt[1])/1000,':k','linear regression'),
+                            (num_months,linear_func(num_months, popt[0], popt[1])/1000,'ko',None)]
+    else:
+        regression_month = []
+    if summary['regression'] and week>2:
+        intercept, slope = forecast.linearfit(summary['cumsum_billings_by_week'], week)
+        popt = (intercept[0], slope[0])
+        regression_week = [(np.arange(1,num_weeks+1),linear_func(np.arange(1,num_weeks+1), popt[0], popt[1])/1000,':k','linear regression'),
+                           (num_weeks,linear_func(num_weeks, popt[0], popt[1])/1000,'ko',None)]
+    else:
+        regression_week = []
 
-    plt.rcParams["figure.figsize"] = 12,8
-    plt.rcParams["axes.titlesize"] = 24
-    plt.rcParams["axes.labelsize"] = 20
-    plt.rcParams["lines.linewidth"] = 3
-    plt.rcParams["lines.markersize"] = 10
-    plt.rcParams["xtick.labelsize"] = 16
-    plt.rcParams["ytick.labelsize"] = 16
-    plt.style.use('bmh')
+    average_month = [([1,num_months], [totalbudget/num_months, totalbudget/num_months],':k','average budget/month')] if totalbudget else []
+    total_month = [([1,num_months], [totalbudget, totalbudget],'-k','total budget')] if totalbudget else []
+    average_week = [([1,num_weeks], [totalbudget/num_weeks, totalbudget/num_weeks],':k','average budget/week')] if totalbudget else []
+    total_week = [([1,num_weeks], [totalbudget, totalbudget],'-k','total budget')] if totalbudget else []
 
 #### actuals per month
-    text='Actuals per month'
-    print("generating figure:", text)
-    fig, ax = plt.subplots()
-    ax.bar(np.linspace(1,12,12),billings_by_month/1000)
-    ax.set_ylabel('KNOK')
-    ax.set_xticks(np.arange(1,13))
-    ax.set_xticklabels(labels_month)
-    if args.totalbudget:
-        ax.plot([1,12], [args.totalbudget/12, args.totalbudget/12],':k',label='average budget/month')
-        ax.legend()
-    ax.set_title(text)
-    plt.tight_layout()
-    plt.savefig(text+".png")
-
-    ### per employee
-    text='Actuals per month per employee'
-    print("generating figure:", text)
-    fig, (ax,lax) = plt.subplots(ncols=2, gridspec_kw={"width_ratios":[4,1]})
-    bot = np.zeros(12)
-    for a, b in billings_by_employees_by_month.items():
-        ax.bar(np.linspace(1,12,12),b/1000, bottom=bot/1000, label=employees_by_number[a])
-        bot+=b
-    ax.set_ylabel('KNOK')
-    ax.set_xticks(np.arange(1,13))
-    ax.set_xticklabels(labels_month)
-    if args.totalbudget:
-        ax.plot([1,12], [args.totalbudget/12, args.totalbudget/12],':k',label='average budget/month')
-    h,l = ax.get_legend_handles_labels()
-    lax.legend(h,l, borderaxespad=0)
-    lax.axis("off")
-    ax.set_title(text)
-    plt.tight_layout()
-    plt.savefig(text+".png")
-
-
+    employeeseries, _ = groupemployees(summary['billings_by_employees_by_month'], summary['names'], totals, top)
+    addjob(figures.barchart, 'Actuals per month', y=summary['billings_by_month'], **monthticks,
+           lines=average_month, legend=bool(totalbudget))
+    addjob(figures.stackedbarchart, 'Actuals per month per employee', series=employeeseries, labels=employeenames,
+           **monthticks, lines=average_month)
 
 ### actuals accumulated per month
-    text='Actuals accumulated per month'
-    print("generating figure:", text)
-    fig, ax = plt.subplots()
-    ax.bar(np.linspace(1,12,12),cumsum_billings_by_month/1000)
-    ax.set_ylabel('KNOK')
-    ax.set_xticks(np.arange(1,13))
-    ax.set_xticklabels(labels_month)
-    if args.totalbudget:
-        ax.plot([1,12], [args.totalbudget, args.totalbudget],'-k',label='total budget')
-
-    if args.regressionON and month>2:
-        ydata = cumsum_billings_by_month[:month]
-        xdata = np.arange(1,month+1)
-        popt, pcov = curve_fit(linear_func, xdata, ydata)
-        ax.plot(np.arange(1,13),linear_func(np.arange(1,13), popt[0], popt[1])/1000,':k',label='linear regression')
-        ax.plot(12,linear_func(12, popt[0], popt[1])/1000,'ko')
-        ax.legend()
-    ax.set_title(text)
-    plt.tight_layout()
-    plt.savefig(text+".png")
-
-    ### per employee
-    text='Actuals accumulated per month per employee'
-    print("generating figure:", text)
-    fig, (ax,lax) = plt.subplots(ncols=2, gridspec_kw={"width_ratios":[4,1]})
-    bot = np.zeros(12)
-    for a, b in billings_by_employees_by_month.items():
-        bc = np.cumsum(b)
-        bc[month:] = 0
-        ax.bar(np.linspace(1,12,12),bc/1000, bottom=bot/1000, label=employees_by_number[a])
-        bot+=bc
-    ax.set_ylabel('KNOK')
-    ax.set_xticks(np.arange(1,13))
-    ax.set_xticklabels(labels_month)
-    if args.totalbudget:
-        ax.plot([1,12], [args.totalbudget, args.totalbudget],'-k',label='total budget')
-
-    if args.regressionON and month>2:
-        ax.plot(np.arange(1,13),linear_func(np.arange(1,13), popt[0], popt[1])/1000,':k',label='linear regression')
-        ax.plot(12,linear_func(12, popt[0], popt[1])/1000,'ko')
-    h,l = ax.get_legend_handles_labels()
-    lax.legend(h,l, borderaxespad=0)
-    lax.axis("off")
-    ax.set_title(text)
-    plt.tight_layout()
-    plt.savefig(text+".png")
+    addjob(figures.barchart, 'Actuals accumulated per month', y=summary['cumsum_billings_by_month'], **monthticks,
+           lines=total_month+regression_month, legend=bool(regression_month))
+    accumulated = np.cumsum(employeeseries, axis=1)
+    accumulated[:,month:] = 0
+    addjob(figures.stackedbarchart, 'Actuals accumulated per month per employee', series=accumulated, labels=employeenames,
+           **monthticks, lines=total_month+regression_month)
 
 #### actuals per week
-    text='Actuals per week'
-    print("generating figure:", text)
-    fig, ax = plt.subplots()
-    ax.bar(np.linspace(1,num_weeks,num_weeks),billings_by_week/1000)
-    ax.set_ylabel('KNOK')
-    if args.totalbudget:
-        ax.plot([1,num_weeks], [args.totalbudget/num_weeks, args.totalbudget/num_weeks],':k',label='average budget/week')
-        ax.legend()
-    ax.set_title(text)
-    plt.tight_layout()
-    plt.savefig(text+".png")
-
-    ### per employee
-    text='Actuals per week per employee'
-    print("generating figure:", text)
-    fig, (ax,lax) = plt.subplots(ncols=2, gridspec_kw={"width_ratios":[4,1]})
-    bot = np.zeros(num_weeks)
-    for a, b in billings_by_employees_by_week.items():
-        ax.bar(np.linspace(1,num_weeks,num_weeks),b/1000, bottom=bot/1000, label=employees_by_number[a])
-        bot+=b
-    ax.set_ylabel('KNOK')
-    if args.totalbudget:
-        ax.plot([1,num_weeks], [args.totalbudget/num_weeks, args.totalbudget/num_weeks],':k',label='average budget/week')
-    h,l = ax.get_legend_handles_labels()
-    lax.legend(h,l, borderaxespad=0)
-    lax.axis("off")
-    ax.set_title(text)
-    plt.tight_layout()
-    plt.savefig(text+".png")
-
+    employeeseries, _ = groupemployees(summary['billings_by_employees_by_week'], summary['names'], totals, top)
+    addjob(figures.barchart, 'Actuals per week', y=summary['billings_by_week'], **weekticks, lines=average_week, legend=bool(totalbudget))
+    addjob(figures.stackedbarchart, 'Actuals per week per employee', series=employeeseries, labels=employeenames,
+           **weekticks, lines=average_week)
 
 ### actuals accumulated per week
-    text='Actuals accumulated per week'
-    print("generating figure:", text)
-    fig, ax = plt.subplots()
-    ax.bar(np.linspace(1,num_weeks,num_weeks),cumsum_billings_by_week/1000)
-    ax.set_ylabel('KNOK')
-    if args.totalbudget:
-        ax.plot([1,num_weeks], [args.totalbudget, args.totalbudget],'-k',label='total budget')
-
-    if args.regressionON and week>2:
-        ydata = cumsum_billings_by_week[:week]
-        xdata = np.arange(1,week+1)
-        popt, pcov = curve_fit(linear_func, xdata, ydata)
-        ax.plot(np.arange(1,num_weeks+1),linear_func(np.arange(1,num_weeks+1), popt[0], popt[1])/1000,':k',label='linear regression')
-        ax.plot(num_weeks,linear_func(num_weeks, popt[0], popt[1])/1000,'ko')
-        ax.legend()
-    ax.set_title(text)
-    plt.tight_layout()
-    plt.savefig(text+".png")
-
-    ### per employee
-    text='Actuals accumulated per week per employee'
-    print("generating figure:", text)
-    fig, (ax,lax) = plt.subplots(ncols=2, gridspec_kw={"width_ratios":[4,1]})
-    bot = np.zeros(num_weeks)
-    for a, b in billings_by_employees_by_week.items():
-        bc = np.cumsum(b)
-        bc[week:] = 0
-        ax.bar(np.linspace(1,num_weeks,num_weeks),bc/1000, bottom=bot/1000, label=employees_by_number[a])
-        bot+=bc
-    ax.set_ylabel('KNOK')
-    if args.totalbudget:
-        ax.plot([1,num_weeks], [args.totalbudget, args.totalbudget],'-k',label='total budget')
-
-    if args.regressionON and week>2:
-        ax.plot(np.arange(1,num_weeks+1),linear_func(np.arange(1,num_weeks+1), popt[0], popt[1])/1000,':k',label='linear regression')
-        ax.plot(num_weeks,linear_func(num_weeks, popt[0], popt[1])/1000,'ko')
-
-    h,l = ax.get_legend_handles_labels()
-    lax.legend(h,l, borderaxespad=0)
-    lax.axis("off")
-    ax.set_title(text)
-    plt.tight_layout()
-    plt.savefig(text+".png")
+    addjob(figures.barchart, 'Actuals accumulated per week', y=summary['cumsum_billings_by_week'], **weekticks,
+           lines=total_week+regression_week, legend=bool(regression_week))
+    accumulated = np.cumsum(employeeseries, axis=1)
+    accumulated[:,week:] = 0
+    addjob(figures.stackedbarchart, 'Actuals accumulated per week per employee', series=accumulated, labels=employeenames,
+           **weekticks, lines=total_week+regression_week)
 
 ### pie charts
-    employeenames = list(employees_by_number.values())
-    pie_sizes = np.array(list(billings_by_employees_by_year.values()))
-    usedbudget = np.sum(pie_sizes)
-
     if usedbudget>0:
+        addjob(figures.piechart, 'Budget actuals', sizes=pie_sizes/usedbudget, labels=employeenames)
+        addjob(figures.labeledpiechart, 'Budget actuals', 'Budget actuals2', sizes=pie_sizes/usedbudget, labels=employeenames)
 
-        text='Budget actuals'
-        print("generating figure:", text)
-
-        ### legend outside
-        fig, ax = plt.subplots()
-        y = pie_sizes/usedbudget
-        patches, texts = ax.pie(y, shadow=True, startangle=90)
-        percent = 100.*y/y.sum()
-        labels = ['{0} - {1:1.1f} %'.format(i,j) for i,j in zip(employeenames, percent)]
-        sort_legend = True
-        if sort_legend:
-            patches, labels, dummy =  zip(*sorted(zip(patches, labels, y), key=lambda x: x[2], reverse=True))
-        plt.legend(patches, labels, loc='center left', bbox_to_anchor=(-0.1, 1.))
-        ax.axis('equal')
-        ax.set_title(text)
-        plt.tight_layout()
-        plt.savefig(text+".png")
-
-        ### legend within
-        fig, ax = plt.subplots()
-        ax.pie(pie_sizes/usedbudget, labels=employeenames, autopct='%1.1f%%', shadow=True, startangle=90)
-        ax.axis('equal')
-        ax.set_title(text)
-        plt.tight_layout()
-        plt.savefig(text+"2.png")
-
-
-    if args.totalbudget and args.totalbudget*1000>=usedbudget:
-        text='Budget total'
-        print("generating figure:", text)
+    if totalbudget and totalbudget*1000>=usedbudget:
         explode = np.append(np.zeros_like(pie_sizes), 0.1)
         pie_labels = employeenames.copy()
         pie_labels.append('remaining')
-        pie_sizes = np.append(pie_sizes, args.totalbudget*1000-usedbudget)
-        pie_sizes = pie_sizes/args.totalbudget*1000
-
-        ### legend outside
-        fig, ax = plt.subplots()
-        y = pie_sizes
-        patches, texts = ax.pie(y, explode=explode, shadow=True, startangle=90)
-        percent = 100.*y/y.sum()
-        labels = ['{0} - {1:1.1f} %'.format(i,j) for i,j in zip(pie_labels, pie_sizes/np.sum(pie_sizes)*100)]
-        sort_legend = True
-        if sort_legend:
-            patches, labels, dummy =  zip(*sorted(zip(patches, labels, y), key=lambda x: x[2], reverse=True))
-        plt.legend(patches, labels, loc='center left', bbox_to_anchor=(-0.1, 1.))
-        ax.axis('equal')
-        ax.set_title(text)
-        plt.tight_layout()
-        plt.savefig(text+".png")
-
-        ### legend within
-        fig, ax = plt.subplots()
-        ax.pie(pie_sizes, explode=explode, labels=pie_labels, autopct='%1.1f%%', shadow=True, startangle=90)
-        ax.axis('equal')
-        ax.set_title(text)
-        plt.tight_layout()
-        plt.savefig(text+"2.png")
-
-    ### print some stats
+        sizes = np.append(pie_sizes, totalbudget*1000-usedbudget)
+        sizes = sizes/totalbudget*1000
+        addjob(figures.piechart, 'Budget total', sizes=sizes, labels=pie_labels, explode=explode)
+        addjob(figures.labeledpiechart, 'Budget total', 'Budget total2', sizes=sizes, labels=pie_labels, explode=explode)
+    return jobs
+
+def printjobs(jobs):
+    ### progress lines of the command line, one per figure; the labeled pie charts share the text of their pie chart
+    for text in dict.fromkeys(kwargs['text'] for _, kwargs in jobs):
+        print("generating figure:", text)
+
+### print some stats
+def printtable(summary):
+    employeenames = summary['names']
+    periods = summary['periods']
+    usedbudget = summary['used']
+    totalbudget = summary['totalbudget']
+
     ln = len(max(employeenames, key=len))
-    tot={}
-    for a,b in billings_by_employees_by_year.items():
-        tot[a]=str(int(b/1000)).rjust(6, ' ')
-    
-    print("Billings [KNOK] (modulo round off errors):")
-    tmp=str("Employee").ljust(ln, ' ')+" |"
+    separator=str("-").ljust(ln, '-')+"--"
     for i in range(0,12):
-        tmp+=labels_month[i].rjust(4, ' ')
-    tmp+="| total"
-    print(tmp)
+        separator+=str("-").rjust(4, '-')
+    separator+="-------"
+
+    ### one block of twelve months per year
+    for y in range(periods['num_years']):
+        columns = slice(12*y, 12*y+12)
+        by_month = summary['billings_by_employees_by_month'][:, columns]
+        billings_by_month = summary['billings_by_month'][columns]
+        if periods['num_years'] == 1:
+            print("Billings [KNOK] (modulo round off errors):")
+        else:
+            if y > 0:
+                print("")
+            print("Billings [KNOK] "+str(periods['first_year']+y)+" (modulo round off errors):")
+        tmp=str("Employee").ljust(ln, ' ')+" |"
+        for i in range(0,12):
+            tmp+=labels_month[i].rjust(4, ' ')
+        tmp+="| total"
+        print(tmp)
+        print(separator)
 
-    tmp=str("-").ljust(ln, '-')+"--"
-    for i in range(0,12):
-        tmp+=str("-").rjust(4, '-')
-    tmp+="-------"
-    print(tmp)
+        for a,b in enumerate(by_month):
+            tmp=employeenames[a].ljust(ln, ' ')+" |"
+            for i in range(0,12):
+                tmp+=str(int(b[i]/1000)).rjust(4, ' ')
+            tmp+="|"+str(int(np.sum(b)/1000)).rjust(6, ' ')
+            print(tmp)
+        print(separator)
 
-    for a,b in billings_by_employees_by_month.items():
-        tmp=employees_by_number[a].ljust(ln, ' ')+" |"
+        tmp=str("total").ljust(ln, ' ')+" |"
         for i in range(0,12):
-            tmp+=str(int(b[i]/1000)).rjust(4, ' ')
-        tmp+="|"+tot[a]
+            tmp+=str(int(billings_by_month[i]/1000)).rjust(4, ' ')
+        tmp+="|"+str(int(np.sum(billings_by_month)/1000)).rjust(6,' ')
         print(tmp)
+        print(separator)
 
-    tmp=str("-").ljust(ln, '-')+"--"
-    for i in range(0,12):
-        tmp+=str("-").rjust(4, '-')
-    tmp+="-------"
-    print(tmp)
-
-    tmp=str("total").ljust(ln, ' ')+" |"
-    for i in range(0,12):
-        tmp+=str(int(billings_by_month[i]/1000)).rjust(4, ' ')
-    tmp+="|"+str(int(usedbudget/1000)).rjust(6,' ')
-    print(tmp)
-    tmp=str("-").ljust(ln, '-')+"--"
-    for i in range(0,12):
-        tmp+=str("-").rjust(4, '-')
-    tmp+="-------"
-    print(tmp)
+    if periods['num_years'] > 1:
+        print("")
+        print("Total "+str(periods['first_year'])+"-"+str(periods['first_year']+periods['num_years']-1)+":", int(usedbudget/1000), " KNOK")
 
-    if args.totalbudget:
+    if totalbudget:
         print("")
-        print("Remaining:", args.totalbudget-int(usedbudget/1000), " KNOK")
+        print("Remaining:", totalbudget-int(usedbudget/1000), " KNOK")
+    if 'projected' in summary:
+        print("Projected at end of year:", int(summary['projected']/1000), " KNOK")
+        if totalbudget:
+            exhausted = summary['exhaustion']
+            print("Budget exhausted:", exhausted if not np.isnat(exhausted) else "not at the current burn rate")
     print("")
 
-    if not args.totalbudget:
+    if not totalbudget:
         print("hint: specify total budget with command line option --totalbudget [KNOK]")
+
+### figures into outdir and the billing table to stdout for one project
+def report(table, totalbudget, regressionON, outdir=".", executor=None, plots=True, window=None, project=None, periods=None):
+    with instrument.stage('aggregate', project):
+        summary = summarize(table, totalbudget, regressionON, window, periods=periods)
+    ### matplotlib is only imported when figures are made
+    if plots:
+        import figures
+        jobs = figurejobs(summary, outdir)
+        printjobs(jobs)
+        with instrument.stage('render', project):
+            figures.render(jobs, executor)
+    printtable(summary)
+    return summary
+
+### figures of several projects: in one pass over a figure pool into project_<p> directories of outdir (or outdir itself
+### with subdirs False), or into one multi-page report (.pdf or .html) with the billing table of every project
+def renderprojects(summaries, outdir=".", reportfile=None, processes=None, subdirs=True, executor=None):
+    ### on executor, or a figure pool of processes started here
+    import figures
+    summaries = {p: summary for p, summary in summaries.items() if 'periods' in summary}
+    if reportfile is not None:
+        return batchreport(summaries, reportfile, processes, executor)
+    jobs = []
+    for p, summary in summaries.items():
+        projectdir = os.path.join(outdir, 'project_'+str(p)) if subdirs else outdir
+        os.makedirs(projectdir, exist_ok=True)
+        jobs += figurejobs(summary, projectdir)
+    printjobs(jobs)
+    with instrument.stage('render'), contextlib.nullcontext(executor) if executor else figures.pool(processes) as executor:
+        return figures.render(jobs, executor)
+
+def batchreport(summaries, fn, processes=None, executor=None):
+    import figures
+    _, ext = os.path.splitext(fn)
+    if ext not in ('.pdf', '.html'):
+        raise NotImplementedError('report format '+ext)
+    with tempfile.TemporaryDirectory() as tmp:
+        sections = []
+        for p, summary in summaries.items():
+            projectdir = os.path.join(tmp, 'project_'+str(p))
+            os.makedirs(projectdir)
+            jobs = figurejobs(summary, projectdir, '.svg')
+            printjobs(jobs)
+            for _, kwargs in jobs:
+                kwargs['text'] = str(p)+": "+kwargs['text']
+            table = io.StringIO()
+            with contextlib.redirect_stdout(table):
+                printtable(summary)
+            sections.append(("Project "+str(p), table.getvalue(), jobs))
+        with instrument.stage('render'):
+            if ext == '.pdf':
+                figures.pdfreport(fn, sections)
+            else:
+                with contextlib.nullcontext(executor) if executor else figures.pool(processes) as executor:
+                    figures.htmlreport(fn, sections, executor)
+    print("report:", fn)
+    return fn
+
+### the ledger of a project is brought up to date with the billing table and its rollups are used instead of the table
+def updateledger(ledgerdir, project, table):
+    import ledger
+    with instrument.stage('ledger', project):
+        db = ledger.connect(ledgerdir, project)
+        try:
+            counts = ledger.ingest(db, table)
+            periods = ledger.periods(db)
+        finally:
+            db.close()
+    print("ledger:", counts['new'], "new,", counts['corrected'], "corrected,", counts['removed'], "removed rows")
+    return periods
+
+### many projects: downloads and budgets are concurrent requests of the maconomy client (maconomy.Maconomy), parsing runs on a process pool
+async def _fetchprojects(projects, startdate, enddate, totalbudget, client, parsers, snapshots):
+    loop = asyncio.get_running_loop()
+
+    async def fetchtable(p):
+        ### each export is parsed as soon as its download is done
+        filename = await client.data(p, downloadname(p), startdate, enddate)
+        parsed = loop.run_in_executor(parsers, functools.partial(instrument.remote, 'parse', p, loadbillingtable, filename, getbillingtable_file, snapshots))
+        return instrument.collect(await parsed)
+
+    ### errors of projects failing after their retries are returned in failures: a project whose download or parse fails
+    ### has no table, one whose budget fails has the budget None
+    tables = asyncio.gather(*[fetchtable(p) for p in projects], return_exceptions=True)
+    budgets = asyncio.gather(*[client.budget(p) for p in projects], return_exceptions=True) if not totalbudget else None
+    tables = dict(zip(projects, await tables))
+    budgets = dict(zip(projects, await budgets)) if budgets is not None else {p: totalbudget for p in projects}
+    failures = {}
+    for p in projects:
+        if isinstance(budgets[p], Exception):
+            failures[p] = budgets[p]
+            budgets[p] = None
+        if isinstance(tables[p], Exception):
+            failures[p] = tables[p]
+            del tables[p]
+    return tables, budgets, failures
+
+def fetchprojects(projects, startdate, enddate, totalbudget, client, processes=None, snapshots=True):
+    ### the parse workers are forked before the downloads start threads
+    with instrument.startworkers(ProcessPoolExecutor(max_workers=processes, initializer=instrument.worker)) as parsers:
+        return asyncio.run(_fetchprojects(projects, startdate, enddate, totalbudget, client, parsers, snapshots))
+
+def portfolio(projects, startdate, enddate, totalbudget, regressionON, client, processes=None, snapshots=True, plots=True, outdir=".", reportfile=None, ledgerdir=None):
+    with contextlib.ExitStack() as stack:
+        ### the figure workers are forked before the downloads start threads; pdf reports are rendered in this process
+        executor = None
+        if plots and not str(reportfile).endswith('.pdf'):
+            import figures
+            executor = stack.enter_context(figures.pool(processes))
+        tables, budgets, failures = fetchprojects(projects, startdate, enddate, totalbudget, client, processes, snapshots)
+
+        summaries = {}
+        for p in projects:
+            print("")
+            print("Project", p)
+            if p not in tables:
+                print("failed:", str(failures[p]) or type(failures[p]).__name__)
+                continue
+            if p in failures:
+                print("budget failed:", str(failures[p]) or type(failures[p]).__name__)
+            if len(tables[p]['billing']) == 0:
+                print("no billings")
+                summaries[p] = {'used': 0, 'totalbudget': budgets[p]}
+                continue
+            periods = updateledger(ledgerdir, p, tables[p]) if ledgerdir else None
+            summaries[p] = report(tables[p], budgets[p], regressionON, plots=False, project=p, periods=periods)
+        failed = [p for p in failures if p not in tables]
+        if failures:
+            print("")
+        if failed:
+            print(len(failed), "of", len(projects), "projects failed:", ", ".join(failed))
+        if len(failed) < len(failures):
+            print("budget failed for", len(failures)-len(failed), "of", len(projects), "projects:", ", ".join(p for p in failures if p in tables))
+        if summaries:
+            printportfolio(summaries)
+        ### figures of all projects at once, so the figure pool stays busy
+        if plots:
+            renderprojects(summaries, outdir, reportfile, processes, executor=executor)
+    return summaries
+
+def printportfolio(summaries):
+    ln = max(len("Project"), max(len(str(p)) for p in summaries))
+    print("")
+    print("Portfolio [KNOK] (modulo round off errors):")
+    print(str("Project").ljust(ln, ' ')+" |"+"actuals".rjust(9, ' ')+"budget".rjust(9, ' ')+"remaining".rjust(10, ' '))
+    print(str("-").ljust(ln, '-')+"--"+str("-").rjust(28, '-'))
+    used = 0
+    budget = 0
+    for p, summary in summaries.items():
+        used += summary['used']
+        tmp = str(p).ljust(ln, ' ')+" |"+str(int(summary['used']/1000)).rjust(9, ' ')
+        if summary['totalbudget']:
+            budget += summary['totalbudget']
+            tmp += str(summary['totalbudget']).rjust(9, ' ')+str(summary['totalbudget']-int(summary['used']/1000)).rjust(10, ' ')
+        print(tmp)
+    print(str("-").ljust(ln, '-')+"--"+str("-").rjust(28, '-'))
+    tmp = str("total").ljust(ln, ' ')+" |"+str(int(used/1000)).rjust(9, ' ')
+    if budget:
+        tmp += str(budget).rjust(9, ' ')+str(budget-int(used/1000)).rjust(10, ' ')
+    print(tmp)
+
+def readprojects(fn):
+    ### one project number per line, "#" starts a comment
+    projects = []
+    with open(fn) as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                projects.append(line)
+    return projects
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Parse and plot data')
+    parser.add_argument('--projectnumber', metavar='projectnumber', required=False, type=str, default='None', help='project number')
+    parser.add_argument('--projects', metavar='projects', required=False, type=str, help='comma separated project numbers')
+    parser.add_argument('--projectfile', metavar='projectfile', required=False, type=str, help='file with one project number per line')
+    parser.add_argument('--jobs', metavar='jobs', required=False, type=int, default=8, help='concurrent maconomy downloads')
+    parser.add_argument('--timeout', metavar='timeout', required=False, type=float, default=600, help='seconds before a maconomy request is given up')
+    parser.add_argument('--retries', metavar='retries', required=False, type=int, default=3, help='retries of maconomy requests failing with network errors or timeouts')
+    parser.add_argument('--no-plots', '--table-only', dest='noplots', action='store_true', help='only print the billing table, no figures')
+    parser.add_argument('--processes', metavar='processes', required=False, type=int, help='processes for parsing and rendering figures, default one per core')
+    parser.add_argument('--cachedir', metavar='cachedir', required=False, type=str, default=cache.defaultcachedir(), help='directory of the download cache')
+    parser.add_argument('--cachettl', metavar='cachettl', required=False, type=float, default=60, help='minutes before cached downloads are refreshed')
+    parser.add_argument('--cachesize', metavar='cachesize', required=False, type=int, default=1024, help='size of the download cache in MB')
+    parser.add_argument('--nocache', action='store_true', help='always download everything from maconomy')
+    parser.add_argument('--nosnapshot', action='store_true', help='always parse the export instead of using its binary snapshot')
+    parser.add_argument('--plugin', metavar='plugin', required=False, action='append', default=[], help='module that registers more export layouts (see readers.py), can be repeated')
+    parser.add_argument('--outdir', metavar='outdir', required=False, type=str, default='.', help='directory for figures, projects get project_<projectnumber> directories in it')
+    parser.add_argument('--report', metavar='report', required=False, type=str, help='render all figures into one .pdf or .html report instead of png files')
+    parser.add_argument('--ledger', metavar='ledger', required=False, type=str, help='directory of per-project ledgers that exports are ingested into incrementally')
+    parser.add_argument('--utilization', action='store_true', help='print the billings of every employee across all projects by month (several projects)')
+    parser.add_argument('--capacity', metavar='capacity', required=False, type=float, help='capacity in KNOK per employee and month for --utilization, months above it are overbooked')
+    parser.add_argument('--filename', metavar='filename', required=False, type=str, help='name of cvs file')
+    parser.add_argument('--stream', action='store_true', help='aggregate a delimited --filename while reading it, with memory independent of its size (no ledger)')
+    parser.add_argument('--totalbudget', metavar='totalbudget', required=False, type=int, help='total budget in KNOK')
+    parser.add_argument('--regressionON', metavar='regressionON', type=str2bool, nargs='?', const=True, default=True, help='plot regression')
+    parser.add_argument('--top', metavar='top', required=False, type=int, default=topemployees, help='employees shown in figures, the others are summed up as "other" (0 for all)')
+    parser.add_argument('--export', metavar='export', required=False, type=str, help='export the aggregated results to a .json, .csv or .parquet file')
+    parser.add_argument('--profile', action='store_true', help='print time and peak memory of every stage (tracing memory slows the run down)')
+    parser.add_argument('--trace', metavar='trace', required=False, type=str, help='write the stages to a trace file (chrome trace event json)')
+    parser.add_argument('--cprofile', metavar='cprofile', required=False, type=str, help='write a cProfile of the run to this file')
+    parser.add_argument('--startdate', metavar='startdate', required=False, type=str, default='None', help='start date in format dmY')
+    parser.add_argument('--enddate', metavar='enddate', required=False, type=str, default='None', help='end date in format dmY')
+    args = parser.parse_args()
+    if args.stream and (not args.filename or args.ledger):
+        parser.error('--stream aggregates a --filename and has no ledger')
+
+
+    if args.startdate != 'None':
+        args.startdate = datetime.datetime.strptime(args.startdate, "%d%m%Y").date()
+    else:
+        args.startdate = None
+    if args.enddate != 'None':
+        args.enddate = datetime.datetime.strptime(args.enddate, "%d%m%Y").date()
+    else:
+        args.enddate = None
+
+    readers.loadplugins(args.plugin)
+    if args.stream:
+        try:
+            kind = readers.sniff(args.filename)['kind']
+        except (OSError, NotImplementedError) as e:
+            parser.error(str(e))
+        if kind != 'delimited':
+            parser.error('--stream aggregates delimited exports, '+args.filename+' is '+kind)
+    topemployees = args.top
+    if args.profile:
+        instrument.tracememory()
+
+    with instrument.cprofile(args.cprofile):
+        if args.projects or args.projectfile or args.projectnumber != 'None':
+            from sintefpy.projectdata import fetch
+            import maconomy
+            budget = functools.partial(getbudget, timeout=args.timeout)
+            if not args.nocache:
+                fetch = cache.cachedfetch(fetch, args.cachedir, args.cachettl*60, args.cachesize*1024**2)
+                budget = cache.cachedbudget(budget, args.cachedir, args.cachettl*60)
+            client = maconomy.Maconomy(fetch, budget, args.jobs, args.timeout, args.retries)
+
+        if args.projects or args.projectfile:
+            projects = args.projects.split(",") if args.projects else []
+            if args.projectfile:
+                projects += readprojects(args.projectfile)
+            print("Downloading data for", len(projects), "projects from maconomy...", flush=True)
+            summaries = portfolio(projects, args.startdate, args.enddate, args.totalbudget, args.regressionON, client, processes=args.processes, snapshots=not args.nosnapshot, plots=not args.noplots, outdir=args.outdir, reportfile=args.report, ledgerdir=args.ledger)
+            if args.utilization:
+                import utilization
+                with instrument.stage('utilization'):
+                    ### the ledgers have the whole history of the projects, the summaries what was downloaded
+                    index = utilization.fromledgers(args.ledger, projects) if args.ledger else utilization.fromsummaries(summaries)
+                    result = utilization.utilization(index, args.startdate, args.enddate, args.capacity)
+                utilization.printutilization(index, result, args.capacity)
+        else:
+            if args.projectnumber != 'None':
+                project = args.projectnumber
+                print("Downloading data"+("" if args.totalbudget else " and budget")+" from maconomy...", end=" ", flush=True)
+                filename, totalbudget = client.project(project, downloadname(project), args.startdate, args.enddate, budget=not args.totalbudget)
+                args.totalbudget = args.totalbudget or totalbudget
+                print("done.", flush=True)
+                with instrument.stage('parse', project):
+                    table = loadbillingtable(filename, getbillingtable_file, not args.nosnapshot)
+            elif args.stream:
+                import stream
+                project = os.path.splitext(os.path.basename(args.filename))[0]
+                table = None
+                with instrument.stage('stream', project, message="Aggregating billing table"):
+                    periods = stream.periods(args.filename, args.startdate, args.enddate)
+                if periods is None:
+                    sys.exit("no billings in "+args.filename)
+            else:
+                project = os.path.splitext(os.path.basename(args.filename))[0]
+                with instrument.stage('parse', project, message="Reading billing table"):
+                    ### large delimited exports are parsed in chunks on all processes
+                    parse = functools.partial(getbillingtable_file, processes=args.processes or os.cpu_count())
+                    table = loadbillingtable(args.filename, parse, not args.nosnapshot)
+            window = None
+            if (args.startdate or args.enddate) and table is not None:
+                window = (args.startdate, args.enddate)
+            if table is not None:
+                periods = updateledger(args.ledger, project, table) if args.ledger else None
+            if args.noplots or args.report:
+                summaries = {project: report(table, args.totalbudget, args.regressionON, plots=False, window=window, project=project, periods=periods)}
+                if args.report and not args.noplots:
+                    renderprojects(summaries, reportfile=args.report, processes=args.processes)
+            else:
+                os.makedirs(args.outdir, exist_ok=True)
+                import figures
+                with figures.pool(args.processes) as executor:
+                    summaries = {project: report(table, args.totalbudget, args.regressionON, args.outdir, executor, window=window, project=project, periods=periods)}
+
+        if args.export:
+            import export
+            with instrument.stage('export'):
+                fnames = export.write(export.concat([export.tables(summary, p) for p, summary in summaries.items()]), args.export)
+            for fn in fnames:
+                print("exported:", fn)
+
+    if args.profile:
+        instrument.printprofile()
+    if args.trace:
+        instrument.writetrace(args.trace)
@@ -0,0 +1,81 @@
+import re
+import csv
+import importlib
+import decode
+
+### reader registry: the layout of an export is sniffed from a small prefix of the file and the export is read by the reader of its kind
+###   layouts: Maconomy export layouts, the column names of date, employee number, employee name and billing amount,
+###            the kind of file and the decimal mark used when the prefix has no amounts with decimals
+###   readers: kind -> function(fn, dialect) returning a billing table, dialect is the result of sniff
+###            (kind, layout, delimiter, decimal, dateformat, encoding) and the number of worker processes it may use
+### new layouts (or kinds) are added with registerlayout/registerreader, e.g. from a plugin module loaded with loadplugins
+
+layouts = []
+readers = {}
+delimiters = (";", ",", "\t", "|")
+prefixsize = 65536
+
+def registerlayout(name, columns, kind='delimited', decimal=','):
+    ### later registrations take precedence
+    layouts.insert(0, {'name': name, 'columns': columns, 'kind': kind, 'decimal': decimal})
+
+def registerreader(kind, function):
+    readers[kind] = function
+
+def loadplugins(modules):
+    ### modules register their layouts and readers on import
+    for module in modules:
+        importlib.import_module(module)
+
+def matchlayout(header, kind):
+    for layout in layouts:
+        if layout['kind'] == kind and all(c in header for c in layout['columns'].values()):
+            return layout
+    return None
+
+_decimal = re.compile(r"[0-9]([,.])[0-9]{1,2}-?\)?$")
+
+def sniffdecimal(values, default=","):
+    ### the mark before the last one or two digits, by majority; default if no amount has decimals
+    votes = {",": 0, ".": 0}
+    for v in values:
+        m = _decimal.search(v.strip())
+        if m:
+            votes[m.group(1)] += 1
+    if votes[","] == votes["."]:
+        return default
+    return "," if votes[","] > votes["."] else "."
+
+def sniff(fn):
+    ### dialect of an export from its first prefixsize bytes: kind, layout, delimiter, decimal mark and date format
+    with open(fn, 'rb') as f:
+        prefix = f.read(prefixsize)
+    if prefix.startswith(b'PK\x03\x04'):
+        ### zip container; the header row is matched by the xlsx reader, which reads it anyway
+        return {'kind': 'xlsx', 'layout': None, 'delimiter': None, 'decimal': ',', 'dateformat': 'xlsx', 'encoding': None}
+    encoding = 'utf-8-sig' if prefix.startswith(b'\xef\xbb\xbf') else None
+    text = prefix.decode('utf-8-sig', errors='replace')
+    lines = text.splitlines()
+    if len(prefix) == prefixsize:
+        ### the last line may be cut off
+        lines = lines[:-1]
+    if not lines:
+        raise NotImplementedError('empty export '+fn)
+    for delimiter in delimiters:
+        header = next(csv.reader(lines[:1], delimiter=delimiter))
+        layout = matchlayout(header, 'delimited')
+        if layout is not None:
+            break
+    else:
+        raise NotImplementedError('unknown export layout: '+lines[0][:200])
+    rows = [row for row in csv.reader(lines[1:], delimiter=delimiter) if len(row) == len(header)]
+    columns = layout['columns']
+    decimal = sniffdecimal([row[header.index(columns['billing'])] for row in rows], layout['decimal'])
+    dateformat = decode.dateformat(rows[0][header.index(columns['date'])]) if rows else None
+    return {'kind': 'delimited', 'layout': layout, 'delimiter': delimiter, 'decimal': decimal, 'dateformat': dateformat, 'encoding': encoding}
+
+def read(fn, processes=1):
+    ### billing table of any registered layout, readers may use up to processes worker processes
+    dialect = sniff(fn)
+    dialect['processes'] = processes
+    return readers[dialect['kind']](fn, dialect)
@@ -0,0 +1,68 @@
+import numpy as np
+import aggregate
+import decode
+
+### rollup cube of a billing table: a dense employee x day matrix of prefix sums along time,
+###   prefix[e, d] = billings of employee e before day first_day+d, in øre so that differences are exact
+### built once per dataset, any total between two days is one subtraction per employee, for any number of windows at once
+
+def buildrollup(table):
+    days = table['days']
+    first_day = days.min()
+    num_days = int((days.max() - first_day).astype(np.int64)) + 1
+    num_employees = len(table['numbers'])
+    day_index = (days - first_day).astype(np.int64)[table['date']]
+    flat = table['employee'].astype(np.int64)*num_days + day_index
+    daily = np.bincount(flat, weights=table['billing'], minlength=num_employees*num_days).reshape(num_employees, num_days)
+    prefix = np.zeros((num_employees, num_days+1))
+    np.cumsum(daily, axis=1, out=prefix[:, 1:])
+    return {
+        'numbers': table['numbers'],
+        'names': table['names'],
+        'first_day': first_day,
+        'num_days': num_days,
+        'prefix': prefix,
+    }
+
+def _index(cube, days):
+    ### position in the prefix sums of the start of each day, clipped to the cube
+    offset = (np.asarray(days, dtype='datetime64[D]') - cube['first_day']).astype(np.int64)
+    return np.clip(offset, 0, cube['num_days'])
+
+def _window(cube, start, end):
+    ### dates, date strings or datetime64 arrays of several windows
+    start = cube['first_day'] if start is None else np.asarray(start, dtype='datetime64[D]')
+    end = cube['first_day'] + cube['num_days'] - 1 if end is None else np.asarray(end, dtype='datetime64[D]')
+    return start, end
+
+def total(cube, start, end, employee=None):
+    ### billings from start to end (both inclusive, None for open), per employee or for one employee code;
+    ### start and end may be arrays of windows, giving one column per window
+    start, end = _window(cube, start, end)
+    lo = _index(cube, start)
+    hi = _index(cube, end + 1)
+    prefix = cube['prefix'] if employee is None else cube['prefix'][employee]
+    return (prefix[..., hi] - prefix[..., lo])/decode.subunits
+
+def boundaries(periods, period):
+    ### first day of every period of a period index and the day after the last one
+    if period == 'month':
+        months = periods['first_month'] + np.arange(periods['num_months']+1)
+        return months.astype('datetime64[D]')
+    return aggregate.mondays(periods['first_week'] + np.arange(periods['num_weeks']+1))
+
+def byperiod(cube, periods, period, start=None, end=None):
+    ### employee x period billings of the period index, restricted to start..end
+    start, end = _window(cube, start, end)
+    days = np.clip(boundaries(periods, period), start, end + 1)
+    at = cube['prefix'][:, _index(cube, days)]
+    return (at[:, 1:] - at[:, :-1])/decode.subunits
+
+def aggregate_window(cube, start=None, end=None):
+    ### the same result as aggregate.aggregate on the rows between start and end, without touching the rows
+    start, end = _window(cube, start, end)
+    periods = aggregate.periodindex(np.array([start, end]))
+    periods['by_month'] = byperiod(cube, periods, 'month', start, end)
+    periods['by_week'] = byperiod(cube, periods, 'week', start, end)
+    periods['by_year'] = total(cube, start, end)
+    return periods
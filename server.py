@@ -0,0 +1,308 @@
+import os
+import sys
+import json
+import time
+import datetime
+import functools
+import argparse
+import tempfile
+import threading
+from collections import OrderedDict, deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs, unquote
+import numpy as np
+import plotprojectdata
+import rollup
+import cache
+import maconomy
+
+### local report server: parsed datasets and rendered figures stay in memory between requests
+###   GET /projects/<dataset>/table.json          summary of the billing table
+###   GET /projects/<dataset>/figures.json        names of the figures
+###   GET /projects/<dataset>/<figure>.png|.svg   one figure
+###   GET /metrics                                request latencies per endpoint and cache statistics
+### <dataset> is an export file in --datadir (e.g. ExportProjectCard_123.xlsx) or a project number that is downloaded from maconomy
+### query options: startdate, enddate (dmY), totalbudget (KNOK), regression (true/false)
+
+def nbytes(obj):
+    ### approximate memory footprint of tables, summaries and responses
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, (bytes, str)):
+        return len(obj)
+    if isinstance(obj, dict):
+        return sum(nbytes(v) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(nbytes(v) for v in obj)
+    return sys.getsizeof(obj)
+
+class LRU:
+    ### least recently used entries are evicted until the total size is at most maxbytes
+    def __init__(self, maxbytes):
+        self.maxbytes = maxbytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key][0]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        size = nbytes(value)
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.entries.pop(key)[1]
+            self.entries[key] = (value, size)
+            self.size += size
+            while self.size > self.maxbytes and len(self.entries) > 1:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.size -= evicted
+                self.evictions += 1
+        return value
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'bytes': self.size, 'maxbytes': self.maxbytes,
+                    'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+class Metrics:
+    ### request count, errors and latency percentiles of the last requests per endpoint
+    def __init__(self, window=1000):
+        self.window = window
+        self.endpoints = {}
+        self.lock = threading.Lock()
+
+    def record(self, endpoint, seconds, error=False):
+        with self.lock:
+            e = self.endpoints.setdefault(endpoint, {'count': 0, 'errors': 0, 'total': 0., 'max': 0., 'recent': deque(maxlen=self.window)})
+            e['count'] += 1
+            e['errors'] += int(error)
+            e['total'] += seconds
+            e['max'] = max(e['max'], seconds)
+            e['recent'].append(seconds)
+
+    def stats(self):
+        with self.lock:
+            result = {}
+            for endpoint, e in self.endpoints.items():
+                recent = np.array(e['recent'])
+                result[endpoint] = {'count': e['count'], 'errors': e['errors'], 'mean_ms': 1000*e['total']/e['count'],
+                                    'max_ms': 1000*e['max'],
+                                    'p50_ms': 1000*np.percentile(recent, 50), 'p95_ms': 1000*np.percentile(recent, 95)}
+            return result
+
+def _jsonable(obj):
+    if isinstance(obj, dict):
+        return {k: _jsonable(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_jsonable(v) for v in obj]
+    if isinstance(obj, np.ndarray):
+        if obj.dtype.kind == 'M':
+            return [None if np.isnat(d) else str(d) for d in obj.ravel()] if obj.ndim else (None if np.isnat(obj) else str(obj))
+        return obj.tolist()
+    if isinstance(obj, np.datetime64):
+        return None if np.isnat(obj) else str(obj)
+    if isinstance(obj, np.generic):
+        return obj.item()
+    return obj
+
+class Reports:
+    ### datasets are (table, rollup cube, budget) loaded on first use and reloaded after ttl seconds
+    def __init__(self, datadir=".", client=None, maxbytes=512*1024**2, ttl=3600, executor=None, snapshots=True):
+        self.datadir = datadir
+        self.client = client
+        self.ttl = ttl
+        self.executor = executor
+        self.snapshots = snapshots
+        self.cache = LRU(maxbytes)
+        ### one lock per dataset being loaded, so parallel requests for it wait for one load
+        self.loading = {}
+        self.lock = threading.Lock()
+
+    def datasetkey(self, name):
+        ### files are reloaded when they change, downloads once per ttl
+        fn = os.path.join(self.datadir, os.path.basename(name))
+        if os.path.isfile(fn):
+            st = os.stat(fn)
+            return ('file', fn, st.st_size, st.st_mtime_ns)
+        if name.isdigit() and self.client is not None:
+            return ('project', name, int(time.time()//self.ttl))
+        raise KeyError(name)
+
+    def dataset(self, name):
+        key = self.datasetkey(name)
+        with self.lock:
+            lock = self.loading.setdefault(key, threading.Lock())
+        try:
+            with lock:
+                data = self.cache.get(key)
+                if data is None:
+                    data = self.load(key)
+        finally:
+            with self.lock:
+                if self.loading.get(key) is lock:
+                    del self.loading[key]
+        return data
+
+    def load(self, key):
+        name = fn = key[1]
+        if key[0] == 'file':
+            table = plotprojectdata.loadbillingtable(fn, plotprojectdata.getbillingtable_file, self.snapshots)
+            totalbudget = None
+        else:
+            filename, totalbudget = self.client.project(name, plotprojectdata.downloadname(name))
+            table = plotprojectdata.loadbillingtable(filename, plotprojectdata.getbillingtable_file, self.snapshots)
+        return self.cache.put(key, {'table': table, 'cube': rollup.buildrollup(table), 'totalbudget': totalbudget})
+
+    def summary(self, name, options):
+        data = self.dataset(name)
+        window = None
+        if options['startdate'] or options['enddate']:
+            window = (options['startdate'], options['enddate'])
+        totalbudget = options['totalbudget'] if options['totalbudget'] is not None else data['totalbudget']
+        return plotprojectdata.summarize(data['table'], totalbudget, options['regression'], window, data['cube'])
+
+    def figure(self, name, figure, ext, options):
+        key = ('figure', self.datasetkey(name), figure, ext, tuple(sorted(options.items())))
+        content = self.cache.get(key)
+        if content is not None:
+            return content
+        summary = self.summary(name, options)
+        with tempfile.TemporaryDirectory() as outdir:
+            jobs = plotprojectdata.figurejobs(summary, outdir, ext, names=(figure,))
+            if not jobs:
+                raise KeyError(figure)
+            import figures
+            fname, = figures.render(jobs, self.executor)
+            with open(fname, 'rb') as f:
+                content = f.read()
+        return self.cache.put(key, content)
+
+    def figurenames(self, name, options):
+        summary = self.summary(name, options)
+        return [os.path.splitext(os.path.basename(kwargs['fname']))[0] for _, kwargs in plotprojectdata.figurejobs(summary)]
+
+def _options(query):
+    def value(key):
+        return query[key][-1] if key in query else None
+    def date(key):
+        return datetime.datetime.strptime(value(key), "%d%m%Y").date() if value(key) else None
+    return {
+        'startdate': date('startdate'),
+        'enddate': date('enddate'),
+        'totalbudget': float(value('totalbudget')) if value('totalbudget') else None,
+        'regression': plotprojectdata.str2bool(value('regression')) if value('regression') else True,
+    }
+
+contenttypes = {'.png': 'image/png', '.svg': 'image/svg+xml', '.json': 'application/json'}
+
+def handler(reports, metrics):
+    class Handler(BaseHTTPRequestHandler):
+        def send(self, status, content, contenttype):
+            self.send_response(status)
+            self.send_header('Content-Type', contenttype)
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def sendjson(self, obj, status=200):
+            self.send(status, json.dumps(_jsonable(obj)).encode(), contenttypes['.json'])
+
+        def do_GET(self):
+            start = time.perf_counter()
+            url = urlsplit(self.path)
+            parts = [unquote(p) for p in url.path.split('/') if p]
+            endpoint = 'unknown'
+            status = 200
+            try:
+                options = _options(parse_qs(url.query))
+                if parts == ['metrics']:
+                    endpoint = 'metrics'
+                    self.sendjson({'endpoints': metrics.stats(), 'cache': reports.cache.stats()})
+                elif len(parts) == 3 and parts[0] == 'projects':
+                    name, resource = parts[1], parts[2]
+                    base, ext = os.path.splitext(resource)
+                    if resource == 'table.json':
+                        endpoint = 'table'
+                        self.sendjson(reports.summary(name, options))
+                    elif resource == 'figures.json':
+                        endpoint = 'figures'
+                        self.sendjson(reports.figurenames(name, options))
+                    elif ext in ('.png', '.svg'):
+                        endpoint = 'figure'
+                        self.send(200, reports.figure(name, base, ext, options), contenttypes[ext])
+                    else:
+                        raise KeyError(resource)
+                else:
+                    raise KeyError(url.path)
+            except KeyError as e:
+                status = 404
+                self.sendjson({'error': 'not found: '+str(e)}, status)
+            except (ValueError, NotImplementedError) as e:
+                status = 400
+                self.sendjson({'error': str(e) or type(e).__name__}, status)
+            except Exception as e:
+                ### e.g. a malformed export or a download failing after its retries
+                status = 500
+                self.log_error("%s: %s", type(e).__name__, e)
+                self.sendjson({'error': type(e).__name__+': '+str(e)}, status)
+            finally:
+                metrics.record(endpoint, time.perf_counter()-start, status != 200)
+    return Handler
+
+def serve(reports, host="127.0.0.1", port=8000):
+    httpd = ThreadingHTTPServer((host, port), handler(reports, Metrics()))
+    print("Serving reports on http://"+host+":"+str(port)+"/", flush=True)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Serve billing tables and figures of maconomy projects over http')
+    parser.add_argument('--host', required=False, type=str, default='127.0.0.1', help='address to listen on')
+    parser.add_argument('--port', required=False, type=int, default=8000, help='port to listen on')
+    parser.add_argument('--datadir', required=False, type=str, default='.', help='directory of export files and downloads')
+    parser.add_argument('--memory', required=False, type=int, default=512, help='memory for parsed datasets and figures in MB')
+    parser.add_argument('--processes', required=False, type=int, default=None, help='number of processes for figures')
+    parser.add_argument('--cachedir', required=False, type=str, default=None, help='download cache directory')
+    parser.add_argument('--cachettl', required=False, type=int, default=60, help='minutes before downloads and datasets are refreshed')
+    parser.add_argument('--cachesize', required=False, type=int, default=1024, help='download cache size in MB')
+    parser.add_argument('--nocache', action='store_true', help='do not cache downloads on disk')
+    parser.add_argument('--jobs', required=False, type=int, default=8, help='concurrent maconomy requests')
+    parser.add_argument('--timeout', required=False, type=float, default=600, help='seconds before a maconomy request is given up')
+    parser.add_argument('--retries', required=False, type=int, default=3, help='retries of maconomy requests failing with network errors or timeouts')
+    parser.add_argument('--top', required=False, type=int, default=plotprojectdata.topemployees, help='employees shown in figures, the others are summed up as "other" (0 for all)')
+    parser.add_argument('--nosnapshot', action='store_true', help='do not use binary snapshots of parsed exports')
+    args = parser.parse_args()
+
+    os.chdir(args.datadir)
+    plotprojectdata.topemployees = args.top
+    ### project numbers are only served where maconomy is available
+    try:
+        from sintefpy.projectdata import fetch
+    except ImportError:
+        fetch = None
+    client = None
+    if fetch is not None:
+        budget = functools.partial(plotprojectdata.getbudget, timeout=args.timeout)
+        if not args.nocache:
+            fetch = cache.cachedfetch(fetch, args.cachedir, args.cachettl*60, args.cachesize*1024**2)
+            budget = cache.cachedbudget(budget, args.cachedir, args.cachettl*60)
+        client = maconomy.Maconomy(fetch, budget, args.jobs, args.timeout, args.retries)
+
+    import figures
+    with figures.pool(args.processes) as executor:
+        reports = Reports(".", client, args.memory*1024**2, args.cachettl*60, executor, not args.nosnapshot)
+        serve(reports, args.host, args.port)
@@ -0,0 +1,79 @@
+import os
+import sys
+import json
+import hashlib
+import tempfile
+import zipfile
+import numpy as np
+
+### binary snapshot of a parsed billing table next to its source export, <source>.snapshot.npz
+###   the snapshot is used as long as the source has the same size and either the same mtime or the same content hash,
+###   so re-plotting an unchanged export needs no parsing at all
+
+version = 3
+
+def snapshotname(fn):
+    return fn+'.snapshot.npz'
+
+def _sha1(fn):
+    h = hashlib.sha1()
+    with open(fn, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+def signature(fn):
+    st = os.stat(fn)
+    return {'version': version, 'size': st.st_size, 'mtime': st.st_mtime_ns, 'sha1': _sha1(fn)}
+
+def save(table, fn):
+    ### a temporary file of its own, so concurrent writers of the same snapshot never mix
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(snapshotname(fn))+'.', suffix='.tmp', dir=os.path.dirname(fn) or '.')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f,
+                signature=np.array(json.dumps(signature(fn))),
+                days=table['days'],
+                numbers=np.array([str(n) for n in table['numbers']], dtype=str),
+                names=np.array(table['names'], dtype=str),
+                date=table['date'],
+                employee=table['employee'],
+                billing=table['billing'])
+        os.replace(tmp, snapshotname(fn))
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+def load(fn):
+    ### the billing table, or None if there is no snapshot or it is out of date or damaged
+    try:
+        return _load(fn)
+    except (OSError, ValueError, EOFError, KeyError, zipfile.BadZipFile):
+        return None
+
+def _load(fn):
+    with np.load(snapshotname(fn), allow_pickle=False) as data:
+        stored = json.loads(str(data['signature']))
+        st = os.stat(fn)
+        if stored.get('version') != version or stored['size'] != st.st_size:
+            return None
+        if stored['mtime'] != st.st_mtime_ns and stored['sha1'] != _sha1(fn):
+            return None
+        return {
+            'days': data['days'],
+            'numbers': data['numbers'].tolist(),
+            'names': [sys.intern(name) for name in data['names'].tolist()],
+            'date': data['date'],
+            'employee': data['employee'],
+            'billing': data['billing'],
+        }
+
+def loadorparse(fn, parse):
+    table = load(fn)
+    if table is None:
+        table = parse(fn)
+        try:
+            save(table, fn)
+        except OSError as e:
+            print("could not write snapshot:", e)
+    return table
@@ -0,0 +1,128 @@
+import sys
+import csv
+import numpy as np
+import aggregate
+import decode
+import readers
+
+### streaming aggregation of delimited exports: memory is bounded by employees x periods instead of rows
+### the stages are generators over chunks of chunksize rows and compose like
+###   aggregated(window(normalized(decoded(chunks(fn, dialect), dialect), employees), start, end), employees, start, end)
+###   chunks:     raw columns (dates, numbers, names, amounts) of the export rows
+###   decoded:    (days, numbers, names, amounts in øre), every distinct date string is decoded once
+###   normalized: (days, employee codes, amounts), employees collects numbers and names by first appearance, the last name seen wins
+###   window:     amounts of the rows outside start to end (both inclusive, None for open) become 0, so an open end of the window
+###               is the first or last row of the export as for summarize(table, window=...)
+###   aggregated: running sums per employee and month and per employee and ISO week, returned in the layout of aggregate.aggregate
+###               with the employees' numbers and names; the periods span start to end, or the rows where open
+
+chunksize = 16384
+
+def chunks(fn, dialect, chunksize=chunksize):
+    if dialect['kind'] != 'delimited':
+        raise NotImplementedError('streaming '+dialect['kind']+' exports')
+    columns = dialect['layout']['columns']
+    with open(fn, newline='', encoding=dialect['encoding']) as csv_file:
+        csv_reader = csv.reader(csv_file, delimiter=dialect['delimiter'])
+        header = next(csv_reader)
+        date_index, emplno_index, emplname_index, billing_index = [header.index(columns[c]) for c in ('date', 'number', 'name', 'billing')]
+        dates, numbers, names, amounts = [], [], [], []
+        for row in csv_reader:
+            dates.append(row[date_index])
+            numbers.append(row[emplno_index])
+            names.append(row[emplname_index])
+            amounts.append(row[billing_index])
+            if len(dates) == chunksize:
+                yield dates, numbers, names, amounts
+                dates, numbers, names, amounts = [], [], [], []
+        if dates:
+            yield dates, numbers, names, amounts
+
+def decoded(chunks, dialect):
+    ### days since 1970-01-01 by date string
+    ordinals = {}
+    for dates, numbers, names, amounts in chunks:
+        new = [d for d in set(dates) if d not in ordinals]
+        if new:
+            ordinals.update(zip(new, decode.decodedates(new, dialect['dateformat']).astype(np.int64).tolist()))
+        days = np.fromiter(map(ordinals.__getitem__, dates), dtype=np.int64, count=len(dates)).astype('datetime64[D]')
+        yield days, numbers, names, decode.decodeamounts(amounts, dialect['decimal'])
+
+def employees():
+    return {'numbers': [], 'names': [], 'position': {}}
+
+def normalized(chunks, employees):
+    position = employees['position']
+    for days, numbers, names, amounts in chunks:
+        ### employee numbers of the chunk in order of first appearance with their last name
+        for number, name in dict(zip(numbers, names)).items():
+            code = position.get(number)
+            if code is None:
+                code = position[number] = len(employees['numbers'])
+                employees['numbers'].append(number)
+                employees['names'].append(None)
+            employees['names'][code] = name
+        yield days, np.fromiter(map(position.__getitem__, numbers), dtype=np.int64, count=len(numbers)), amounts
+
+def window(chunks, start=None, end=None):
+    if start is None and end is None:
+        yield from chunks
+        return
+    start = np.datetime64(start if start is not None else 'NaT', 'D')
+    end = np.datetime64(end if end is not None else 'NaT', 'D')
+    for days, codes, amounts in chunks:
+        inside = np.ones(len(days), dtype=bool)
+        if not np.isnat(start):
+            inside &= days >= start
+        if not np.isnat(end):
+            inside &= days <= end
+        yield days, codes, np.where(inside, amounts, 0)
+
+def _accumulate(sums, codes, periods, amounts):
+    ### sums[(employee code, period)] += amounts, exact in øre; periods count from 1970 and are below 2**32
+    keys, inverse = np.unique(codes << 32 | periods, return_inverse=True)
+    totals = np.bincount(inverse, weights=amounts).astype(np.int64)
+    for code, period, total in zip((keys >> 32).tolist(), (keys & 0xffffffff).tolist(), totals.tolist()):
+        sums[code, period] = sums.get((code, period), 0) + total
+
+def _matrix(sums, num_employees, first, num_periods):
+    matrix = np.zeros((num_employees, num_periods))
+    for (code, period), total in sums.items():
+        ### rows outside the window summed to 0, also outside the periods
+        if total:
+            matrix[code, period - first] = total
+    return matrix/decode.subunits
+
+def aggregated(chunks, employees, start=None, end=None):
+    months = {}
+    weeks = {}
+    first = last = None
+    for days, codes, amounts in chunks:
+        if len(days) == 0:
+            continue
+        first = days.min() if first is None else min(first, days.min())
+        last = days.max() if last is None else max(last, days.max())
+        _accumulate(months, codes, days.astype('datetime64[M]').astype(np.int64), amounts)
+        _accumulate(weeks, codes, aggregate.weeknumbers(days), amounts)
+    first = np.datetime64(start, 'D') if start is not None else first
+    last = np.datetime64(end, 'D') if end is not None else last
+    if first is None or last is None:
+        return None
+    result = aggregate.periodindex(np.array([first, last]))
+    num_employees = len(employees['numbers'])
+    result['by_month'] = _matrix(months, num_employees, int(result['first_month'].astype(np.int64)), result['num_months'])
+    result['by_week'] = _matrix(weeks, num_employees, result['first_week'], result['num_weeks'])
+    totals = np.zeros(num_employees)
+    for (code, _), total in months.items():
+        totals[code] += total
+    result['by_year'] = totals/decode.subunits
+    result['numbers'] = employees['numbers']
+    result['names'] = [sys.intern(name) if name else "other" for name in employees['names']]
+    return result
+
+def periods(fn, start=None, end=None, chunksize=chunksize):
+    ### aggregates of an export as summarize(table, window=(start, end)) computes them, None without billings
+    dialect = readers.sniff(fn)
+    found = employees()
+    rows = window(normalized(decoded(chunks(fn, dialect, chunksize), dialect), found), start, end)
+    return aggregated(rows, found, start, end)
@@ -0,0 +1,95 @@
+import os
+import time
+import datetime
+import pytest
+import cache
+
+class _Maconomy:
+    ### fetch of a semicolon separated download of rows, only the rows from start to end
+    def __init__(self, rows, fail=False):
+        self.rows = rows
+        self.fail = fail
+        self.calls = []
+
+    def fetch(self, projectnumber, output_file, start=None, end=None):
+        self.calls.append((projectnumber, start, end))
+        with open(output_file, 'w') as f:
+            f.write("entrydate;employeenumber;employeenamevar;billingpriceregcurrency\n")
+            for row in self.rows:
+                day = datetime.date.fromisoformat(row[0])
+                if (start is None or day >= start) and (end is None or day <= end):
+                    f.write(";".join(row)+"\n")
+            if self.fail:
+                raise ConnectionError('connection reset')
+        return output_file
+
+def _rows(start, days):
+    return [((datetime.date.fromisoformat(start) + datetime.timedelta(days=d)).isoformat(), "1001", "Person 1", "%d.00" % (d+1)) for d in range(days)]
+
+def _read(fn):
+    with open(fn) as f:
+        return sorted(f.read().splitlines()[1:])
+
+def test_refresh_fetches_from_the_last_entrydate(tmp_path):
+    maconomy = _Maconomy(_rows('2024-01-01', 10))
+    fetch = cache.cachedfetch(maconomy.fetch, str(tmp_path / 'cache'), ttl=3600)
+    fetch('1', str(tmp_path / 'a.csv'))
+    fetch('1', str(tmp_path / 'b.csv'))
+    assert maconomy.calls == [('1', None, None)]
+
+    ### a correction on the last cached entrydate and new rows after it
+    maconomy.rows[-1] = (maconomy.rows[-1][0], "1001", "Person 1", "99.00")
+    maconomy.rows += _rows('2024-01-11', 5)
+    maconomy.calls = []
+    expired = cache.cachedfetch(maconomy.fetch, str(tmp_path / 'cache'), ttl=-1)
+    expired('1', str(tmp_path / 'c.csv'))
+    assert maconomy.calls == [('1', datetime.date(2024, 1, 10), None)]
+    assert _read(tmp_path / 'c.csv') == sorted(";".join(row) for row in maconomy.rows)
+
+def test_refresh_starts_no_earlier_than_the_entry(tmp_path):
+    start = datetime.date(2024, 1, 20)
+    maconomy = _Maconomy(_rows('2024-01-01', 40))
+    cachedir = tmp_path / 'cache'
+    cache.cachedfetch(maconomy.fetch, str(cachedir))('1', str(tmp_path / 'a.csv'), start)
+    ### an entry whose last entrydate lies before its start
+    metafn = str(cachedir / 'data_1_2024-01-20_open.json')
+    meta = cache._readmeta(metafn)
+    meta['lastdate'] = '2024-01-05'
+    cache._writemeta(metafn, meta)
+    maconomy.calls = []
+    cache.cachedfetch(maconomy.fetch, str(cachedir), ttl=-1)('1', str(tmp_path / 'b.csv'), start)
+    assert maconomy.calls == [('1', start, None)]
+    assert _read(tmp_path / 'b.csv') == sorted(";".join(row) for row in maconomy.rows[19:])
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    maconomy = _Maconomy(_rows('2024-01-01', 200))
+    cachedir = tmp_path / 'cache'
+    size = len(open(maconomy.fetch('0', str(tmp_path / 'size.csv'))).read())
+    fetch = cache.cachedfetch(maconomy.fetch, str(cachedir), maxbytes=2*size)
+    for p in ('1', '2', '1', '3'):
+        fetch(p, str(tmp_path / 'out.csv'))
+        time.sleep(0.01)
+    assert sorted(fn for fn in os.listdir(cachedir) if fn.endswith('.csv')) == ['data_1_open_open.csv', 'data_3_open_open.csv']
+
+def test_failed_fetch_leaves_no_files(tmp_path):
+    maconomy = _Maconomy(_rows('2024-01-01', 10), fail=True)
+    cachedir = tmp_path / 'cache'
+    with pytest.raises(ConnectionError):
+        cache.cachedfetch(maconomy.fetch, str(cachedir))('1', str(tmp_path / 'a.csv'))
+    assert os.listdir(cachedir) == []
+
+    maconomy.fail = False
+    cache.cachedfetch(maconomy.fetch, str(cachedir))('1', str(tmp_path / 'a.csv'))
+    maconomy.fail = True
+    with pytest.raises(ConnectionError):
+        cache.cachedfetch(maconomy.fetch, str(cachedir), ttl=-1)('1', str(tmp_path / 'a.csv'))
+    assert sorted(os.listdir(cachedir)) == ['data_1_open_open.csv', 'data_1_open_open.json']
+
+def test_evict_removes_stale_downloads(tmp_path):
+    stale = tmp_path / 'data_1_open_open.csv.1234.tmp'
+    running = tmp_path / 'data_2_open_open.csv.5678.delta'
+    for fn in (stale, running):
+        fn.write_text("entrydate\n")
+    os.utime(stale, (time.time()-7200, time.time()-7200))
+    cache.evict(str(tmp_path), 1024**2)
+    assert os.listdir(tmp_path) == [running.name]
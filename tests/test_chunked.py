@@ -0,0 +1,17 @@
+import numpy as np
+import plotprojectdata
+
+def test_chunked_matches_single_pass(csvexport):
+    ### dotted dates, signed amounts with thousands separators and employees changing their names across chunk boundaries
+    fn = csvexport(n=3000, start='2023-01-01', days=400, employees=30, low=0, high=20000, dmy=True, signs=True, thousands=True, renamed=True)
+    columns = plotprojectdata.columns_csv
+    single = plotprojectdata._getbillingtable_delimited(fn, columns, ',', ';', encoding='utf-8')
+    for processes in (2, 3, 7):
+        chunked = plotprojectdata.getbillingtable_chunked(fn, columns, ',', ';', encoding='utf-8', processes=processes)
+        assert chunked.keys() == single.keys()
+        for key in single:
+            if isinstance(single[key], np.ndarray):
+                assert chunked[key].dtype == single[key].dtype
+                np.testing.assert_array_equal(chunked[key], single[key])
+            else:
+                assert chunked[key] == single[key]
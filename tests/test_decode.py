@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+import decode
+
+def test_decodeamounts_decimal_comma():
+    values = ["1 234,50", "1.234,50", "1\xa0234,5", "12,50-", "(12,50)", "-12,5", "=12,5", "", "0,01", "1 000 000,00-", "(1.234.567,89)"]
+    expected = [123450, 123450, 123450, -1250, -1250, -1250, 1250, 0, 1, -100000000, -123456789]
+    assert decode.decodeamounts(values, ",").tolist() == expected
+
+def test_decodeamounts_decimal_point():
+    values = ["1 234.50", "1,234.50", "1'234.5", "12.50-", "(12.50)", "-12.5", "", "1,000,000.00-", "(1,234,567.89)"]
+    expected = [123450, 123450, 123450, -1250, -1250, -1250, 0, -100000000, -123456789]
+    assert decode.decodeamounts(values, ".").tolist() == expected
+
+def test_decodeamounts_exact():
+    ### amounts with two decimals survive the float conversion exactly
+    cents = np.arange(-100000, 100000, 7)
+    values = ["%s%d,%02d" % ("-" if c < 0 else "", abs(c)//100, abs(c) % 100) for c in cents]
+    assert decode.decodeamounts(values, ",").tolist() == cents.tolist()
+
+def test_decodedates():
+    expected = np.array(['2024-02-01', '2024-12-31', '2023-03-09'], dtype='datetime64[D]')
+    for values in (["01.02.2024", "31.12.2024", "09.03.2023"], ["1.2.2024", "31.12.2024", "9.3.2023"], ["2024-02-01", "2024-12-31", "2023-03-09"],
+                   ["=Date(2024,2,1)", "=Date(2024,12,31)", "=Date(2023,3,9)"]):
+        np.testing.assert_array_equal(decode.decodedates(values), expected)
+
+def test_dateformat():
+    assert decode.dateformat("=Date(2024,1,2)") == 'xlsx'
+    assert decode.dateformat("02.01.2024") == decode.dateformat("2.1.2024") == 'dmy'
+    assert decode.dateformat("2024-01-02") == 'iso'
+    for value in ("2024.01.02", "02.01.24", "a.b.2024"):
+        with pytest.raises(ValueError):
+            decode.dateformat(value)
@@ -0,0 +1,14 @@
+import numpy as np
+import export
+import plotprojectdata
+
+def test_actuals_are_summed_in_ore(csvexport):
+    ### amounts whose sum in NOK picks up round off errors as floats
+    table = plotprojectdata.getbillingtable_file(csvexport(n=2000, start='2023-01-01', days=700, employees=37, low=0, high=100000))
+    summary = plotprojectdata.summarize(table, 100000, False)
+    ore = int(table['billing'].sum())
+    totals = export.tables(summary, 'p')['totals']
+    assert totals['actuals'][0] == ore/100
+    assert totals['remaining'][0] == (10**10 - ore)/100
+    by_year = export.tables(summary, 'p')['by_year']['billing']
+    assert np.rint(by_year*100).sum() == ore
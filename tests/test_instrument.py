@@ -0,0 +1,44 @@
+import tracemalloc
+import pytest
+import instrument
+
+MB = 1024**2
+
+@pytest.fixture
+def traced():
+    instrument.tracememory()
+    del instrument.events[:]
+    yield
+    tracemalloc.stop()
+    del instrument.events[:]
+
+def test_traced_peak_is_relative_to_the_stage(traced):
+    before = bytearray(20*MB)
+    with instrument.measure('stage') as event:
+        during = bytearray(5*MB)
+        del during
+    assert 4.9*MB < event['peak_traced'] < 6*MB
+    del before
+
+def test_nested_stages_keep_their_peaks(traced):
+    with instrument.stage('outer'):
+        outer = bytearray(30*MB)
+        del outer
+        with instrument.stage('inner'):
+            inner = bytearray(2*MB)
+            del inner
+        with instrument.stage('inner'):
+            pass
+    inner, empty, outer = instrument.events
+    assert 29.9*MB < outer['peak_traced'] < 31*MB
+    assert 1.9*MB < inner['peak_traced'] < 3*MB
+    assert empty['peak_traced'] < MB
+
+def test_failed_stage_is_recorded(traced):
+    with pytest.raises(ConnectionError):
+        with instrument.stage('fetch', '1001', 'retry 1'):
+            raise ConnectionError('connection reset')
+    event, = instrument.events
+    assert (event['name'], event['project'], event['detail'], event['error']) == ('fetch', '1001', 'retry 1', 'ConnectionError')
+    stages, _ = instrument.summary()
+    assert stages['fetch']['errors'] == 1
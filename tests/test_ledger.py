@@ -0,0 +1,62 @@
+import sqlite3
+import numpy as np
+import aggregate
+import ledger
+import plotprojectdata
+
+def _ledger():
+    db = sqlite3.connect(":memory:")
+    db.executescript(ledger.schema)
+    return db
+
+def _total(db):
+    return db.execute("select coalesce(sum(amount), 0) from rows").fetchone()[0]
+
+def test_incremental_ingest_matches_aggregate(csvexport, exportrows):
+    rows = sorted(exportrows())
+    db = _ledger()
+    ledger.ingest(db, plotprojectdata.getbillingtable_file(csvexport(rows[:250])))
+    table = plotprojectdata.getbillingtable_file(csvexport(rows))
+    counts = ledger.ingest(db, table)
+    assert counts['new'] == len(rows) - 250 and counts['removed'] == 0
+    assert ledger.ingest(db, table) == {'new': 0, 'corrected': 0, 'removed': 0}
+
+    periods = ledger.periods(db)
+    expected = aggregate.aggregate(table)
+    order = [periods['numbers'].index(n) for n in table['numbers']]
+    assert periods['first_month'] == expected['first_month'] and periods['first_week'] == expected['first_week']
+    assert np.array_equal(periods['by_month'][order], expected['by_month'])
+    assert np.array_equal(periods['by_week'][order], expected['by_week'])
+    assert np.array_equal(periods['by_year'][order], expected['by_year'])
+
+def test_correction_in_window(csvexport, exportrows):
+    rows = sorted(exportrows())
+    db = _ledger()
+    ledger.ingest(db, plotprojectdata.getbillingtable_file(csvexport(rows)))
+    date, number, name, _ = rows[-1]
+    rows[-1] = (date, number, name, "1,00")
+    table = plotprojectdata.getbillingtable_file(csvexport(rows))
+    assert ledger.ingest(db, table)['corrected'] == 1
+    assert _total(db) == table['billing'].sum()
+
+def test_export_of_a_later_date_range_removes_nothing(csvexport, exportrows):
+    rows = exportrows()
+    db = _ledger()
+    full = plotprojectdata.getbillingtable_file(csvexport(rows))
+    ledger.ingest(db, full)
+    ### what --startdate downloads: only the rows from a date on
+    cut = [row for row in rows if row[0] >= "2025-01-10"]
+    counts = ledger.ingest(db, plotprojectdata.getbillingtable_file(csvexport(cut, 'cut.csv')))
+    assert counts == {'new': 0, 'corrected': 0, 'removed': 0}
+    assert _total(db) == full['billing'].sum()
+
+def test_backdated_row_older_than_lookback(csvexport, exportrows):
+    rows = exportrows()
+    db = _ledger()
+    ledger.ingest(db, plotprojectdata.getbillingtable_file(csvexport(rows)))
+    rows.append(("2024-10-02", "1003", "Person 3", "2341,00"))
+    table = plotprojectdata.getbillingtable_file(csvexport(rows))
+    counts = ledger.ingest(db, table)
+    assert counts == {'new': 1, 'corrected': 0, 'removed': 0}
+    assert _total(db) == table['billing'].sum()
+    assert np.isclose(ledger.periods(db)['by_year'].sum(), table['billing'].sum()/100)
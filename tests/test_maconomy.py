@@ -0,0 +1,83 @@
+import os
+import time
+import asyncio
+import threading
+import pytest
+import maconomy
+
+class _Fetch:
+    ### fetch that writes the project number, taking seconds per call or per attempt, and counts the calls running at once
+    def __init__(self, seconds=0., errors=()):
+        self.seconds = seconds
+        self.errors = list(errors)
+        self.calls = 0
+        self.running = 0
+        self.most = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, projectnumber, output_file, start=None, end=None):
+        with self.lock:
+            attempt = self.calls
+            self.calls += 1
+            self.running += 1
+            self.most = max(self.most, self.running)
+        try:
+            seconds = self.seconds[attempt] if isinstance(self.seconds, list) else self.seconds
+            time.sleep(seconds)
+            if attempt < len(self.errors) and self.errors[attempt] is not None:
+                raise self.errors[attempt]
+            with open(output_file, 'w') as f:
+                f.write(str(projectnumber)+" attempt "+str(attempt))
+        finally:
+            with self.lock:
+                self.running -= 1
+        return output_file
+
+def _client(fetch, **kwargs):
+    return maconomy.Maconomy(fetch, lambda p: 1000, **dict({'backoff': 0.01}, **kwargs))
+
+async def _data(client, projects, outdir):
+    return await asyncio.gather(*[client.data(p, os.path.join(outdir, p+'.csv')) for p in projects])
+
+def test_timeout_starts_after_a_free_slot(tmp_path):
+    ### four fetches of 0.6 s one at a time take 2.4 s, longer than the timeout of each
+    fetch = _Fetch(0.6)
+    client = _client(fetch, jobs=1, timeout=1, retries=0)
+    asyncio.run(_data(client, ['1', '2', '3', '4'], str(tmp_path)))
+    assert fetch.calls == 4 and fetch.most == 1
+
+def test_jobs_bound_all_event_loops(tmp_path):
+    fetch = _Fetch(0.2)
+    client = _client(fetch, jobs=2)
+    threads = [threading.Thread(target=client.project, args=(str(k), str(tmp_path / (str(k)+'.csv'))), kwargs={'budget': False}) for k in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert fetch.calls == 6 and fetch.most == 2
+
+def test_transient_errors_are_retried(tmp_path):
+    fetch = _Fetch(0., [ConnectionError('connection reset'), asyncio.TimeoutError(), None])
+    assert asyncio.run(_data(_client(fetch), ['1'], str(tmp_path))) == [str(tmp_path / '1.csv')]
+    assert fetch.calls == 3
+    assert open(tmp_path / '1.csv').read() == "1 attempt 2"
+
+def test_timed_out_attempts_are_retried(tmp_path):
+    fetch = _Fetch([1., 0.])
+    asyncio.run(_data(_client(fetch, timeout=0.3), ['1'], str(tmp_path)))
+    assert fetch.calls == 2
+
+def test_other_errors_are_not_retried(tmp_path):
+    fetch = _Fetch(0., [PermissionError('no access to project')])
+    with pytest.raises(PermissionError):
+        asyncio.run(_data(_client(fetch), ['1'], str(tmp_path)))
+    assert fetch.calls == 1
+
+def test_given_up_attempt_does_not_write_into_its_retry(tmp_path):
+    ### the first attempt times out and finishes after its retry
+    fetch = _Fetch([0.8, 0.])
+    asyncio.run(_data(_client(fetch, timeout=0.3), ['1'], str(tmp_path)))
+    time.sleep(1)
+    assert fetch.calls == 2
+    assert open(tmp_path / '1.csv').read() == "1 attempt 1"
+    assert os.listdir(tmp_path) == ['1.csv']
@@ -0,0 +1,32 @@
+import plotprojectdata
+
+class _Client:
+    ### exports of every project but 'broken' from a local file, budgets of every project but 'nobudget'
+    def __init__(self, fn):
+        self.fn = fn
+
+    async def data(self, projectnumber, output_file, start=None, end=None):
+        if projectnumber == 'broken':
+            raise PermissionError('no access to project')
+        return self.fn
+
+    async def budget(self, projectnumber):
+        if projectnumber == 'nobudget':
+            raise FileNotFoundError('spy')
+        return 1000
+
+def test_failing_project_is_left_out(csvexport, capsys):
+    fn = csvexport([("02.01.2024", "1001", "Person 1", "100,00")])
+    summaries = plotprojectdata.portfolio(['1', 'broken', '2'], None, None, None, False, _Client(fn), processes=1, snapshots=False, plots=False)
+    assert list(summaries) == ['1', '2']
+    assert summaries['2']['used'] == 100
+    assert "1 of 3 projects failed: broken" in capsys.readouterr().out
+
+def test_failing_budget_keeps_the_project(csvexport, capsys):
+    fn = csvexport([("02.01.2024", "1001", "Person 1", "100,00")])
+    summaries = plotprojectdata.portfolio(['1', 'nobudget'], None, None, None, False, _Client(fn), processes=1, snapshots=False, plots=False)
+    assert list(summaries) == ['1', 'nobudget']
+    assert summaries['1']['totalbudget'] == 1000 and summaries['nobudget']['totalbudget'] is None
+    assert summaries['nobudget']['used'] == 100
+    out = capsys.readouterr().out
+    assert "budget failed for 1 of 2 projects: nobudget" in out and "projects failed" not in out
@@ -0,0 +1,53 @@
+import pytest
+import plotprojectdata
+import readers
+
+def _write(tmp_path, text, name='export.csv', bom=False):
+    fn = tmp_path / name
+    fn.write_bytes((b'\xef\xbb\xbf' if bom else b'')+text.encode('utf-8'))
+    return str(fn)
+
+@pytest.mark.parametrize('delimiter', [";", ",", "\t", "|"])
+def test_delimiter_and_layout(tmp_path, delimiter):
+    rows = [["Entry Date", "Empl. No.", "Empl. Name", "Billing Price"], ["02.01.2024", "1001", "Person 1", "100"]]
+    dialect = readers.sniff(_write(tmp_path, "\n".join(delimiter.join(row) for row in rows)+"\n"))
+    assert dialect['kind'] == 'delimited' and dialect['layout']['name'] == 'csv'
+    assert dialect['delimiter'] == delimiter and dialect['dateformat'] == 'dmy'
+    ### no amount with decimals: the decimal mark of the layout
+    assert dialect['decimal'] == ','
+
+def test_download_layout(tmp_path):
+    dialect = readers.sniff(_write(tmp_path, "entrydate;employeenumber;employeenamevar;billingpriceregcurrency\n2024-01-02;1001;Person 1;100\n"))
+    assert dialect['layout']['name'] == 'ssv' and dialect['decimal'] == '.' and dialect['dateformat'] == 'iso'
+    assert dialect['encoding'] is None
+
+def test_byte_order_mark(tmp_path, csvexport):
+    fn = _write(tmp_path, open(csvexport(n=10)).read(), 'bom.csv', bom=True)
+    dialect = readers.sniff(fn)
+    assert dialect['layout']['name'] == 'csv' and dialect['encoding'] == 'utf-8-sig'
+    assert plotprojectdata.getbillingtable_file(fn)['billing'].tolist() == plotprojectdata.getbillingtable_file(csvexport(n=10))['billing'].tolist()
+
+def test_decimal_vote():
+    assert readers.sniffdecimal(["1.234,50", "12,5", "(3,10)", "7,00-", "1,234.50"]) == ','
+    assert readers.sniffdecimal(["1,234.50", "12.5", "(3.10)", "1.234,50"]) == '.'
+    assert readers.sniffdecimal(["1 234", "12", ""], '.') == '.'
+    assert readers.sniffdecimal(["12,50", "12.50"], ',') == ','
+
+def test_truncated_last_line(tmp_path, monkeypatch):
+    ### the prefix ends in "1,2" of "1,234.56", which would vote for a decimal comma
+    header = "Entry Date;Empl. No.;Empl. Name;Billing Price;Text\n"
+    first = "2024-01-02;1001;Person 1;1,234.56;x\n"
+    fn = _write(tmp_path, header+first+"2024-01-03;1002;Person 2;1,234.56;x\n")
+    monkeypatch.setattr(readers, 'prefixsize', len(header+first)+len("2024-01-03;1002;Person 2;1,2"))
+    assert readers.sniff(fn)['decimal'] == '.'
+
+def test_unknown_layout(tmp_path):
+    with pytest.raises(NotImplementedError):
+        readers.sniff(_write(tmp_path, "Date;Number;Name;Amount\n2024-01-02;1001;Person 1;100\n"))
+    with pytest.raises(NotImplementedError):
+        readers.sniff(_write(tmp_path, "", 'empty.csv'))
+
+def test_xlsx(tmp_path):
+    fn = tmp_path / 'export.xlsx'
+    fn.write_bytes(b'PK\x03\x04'+bytes(100))
+    assert readers.sniff(str(fn))['kind'] == 'xlsx'
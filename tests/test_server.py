@@ -0,0 +1,73 @@
+import json
+import threading
+import urllib.request
+import urllib.error
+from http.server import ThreadingHTTPServer
+import plotprojectdata
+import server
+
+def test_parallel_requests_load_once(tmp_path, monkeypatch, csvexport):
+    csvexport(n=20)
+    loads = []
+    load = plotprojectdata.loadbillingtable
+
+    def counting(*args):
+        loads.append(args[0])
+        return load(*args)
+
+    monkeypatch.setattr(plotprojectdata, 'loadbillingtable', counting)
+    reports = server.Reports(str(tmp_path), snapshots=False)
+    barrier = threading.Barrier(12)
+
+    def request():
+        barrier.wait()
+        reports.dataset('export.csv')
+
+    threads = [threading.Thread(target=request) for _ in range(12)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(loads) == 1
+    assert reports.loading == {}
+
+def test_unexpected_error_is_500(tmp_path, monkeypatch, csvexport):
+    csvexport(n=20)
+
+    def failing(*args):
+        raise RuntimeError('broken export')
+
+    monkeypatch.setattr(plotprojectdata, 'loadbillingtable', failing)
+    metrics = server.Metrics()
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), server.handler(server.Reports(str(tmp_path), snapshots=False), metrics))
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    try:
+        url = 'http://127.0.0.1:%d/projects/export.csv/table.json' % httpd.server_address[1]
+        try:
+            urllib.request.urlopen(url)
+            assert False
+        except urllib.error.HTTPError as e:
+            assert e.code == 500
+            assert 'broken export' in json.loads(e.read())['error']
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+    assert metrics.stats()['table']['errors'] == 1
+
+def test_figure_renders_only_the_requested_figure(tmp_path, monkeypatch, capsys, csvexport):
+    import figures
+    csvexport(n=200, days=300)
+    rendered = []
+    render = figures.render
+
+    def spy(jobs, executor=None):
+        rendered.append([kwargs['text'] for _, kwargs in jobs])
+        return render(jobs, executor)
+
+    monkeypatch.setattr(figures, 'render', spy)
+    reports = server.Reports(str(tmp_path), snapshots=False)
+    options = server._options({})
+    assert 'Budget actuals2' in reports.figurenames('export.csv', options)
+    assert reports.figure('export.csv', 'Budget actuals2', '.png', options).startswith(b'\x89PNG')
+    assert rendered == [['Budget actuals']]
+    assert "generating figure" not in capsys.readouterr().out
@@ -0,0 +1,50 @@
+import threading
+import numpy as np
+import plotprojectdata
+import snapshot
+
+def _parse(fn):
+    return {
+        'days': np.array(['2024-01-02', '2024-01-03'], dtype='datetime64[D]'),
+        'numbers': ['1001', '1002'],
+        'names': ['Person 1', 'Person 2'],
+        'date': np.array([0, 1, 1], dtype=np.uint16),
+        'employee': np.array([0, 0, 1], dtype=np.uint16),
+        'billing': np.array([100, 250, -50], dtype=np.int64),
+    }
+
+def test_damaged_snapshot_is_parsed_again(csvexport):
+    fn = csvexport([])
+    snapshot.save(_parse(fn), fn)
+    data = open(snapshot.snapshotname(fn), 'rb').read()
+    for size in (10, len(data)//2, len(data)-30):
+        with open(snapshot.snapshotname(fn), 'wb') as f:
+            f.write(data[:size])
+        assert snapshot.load(fn) is None
+        assert snapshot.loadorparse(fn, _parse)['billing'].tolist() == [100, 250, -50]
+
+def test_concurrent_writers(tmp_path, csvexport):
+    fn = csvexport([])
+    threads = [threading.Thread(target=snapshot.save, args=(_parse(fn), fn)) for _ in range(12)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['export.csv', 'export.csv.snapshot.npz']
+    assert snapshot.load(fn)['numbers'] == ['1001', '1002']
+
+def test_xlsx_snapshot_is_the_parsed_table(tmp_path):
+    ### ExportProjectCard workbooks have numeric employee numbers
+    from openpyxl import Workbook
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["Date", "Employee No.", "Employee Name", "Billing Price, Reg."])
+    for row in (["=Date(2024,1,2)", 1001, "Person 1", "=100,5"], ["=Date(2024,1,3)", 1002, "Person 2", 250], ["=Date(2024,1,3)", "1001", "Person 1", 1.25]):
+        ws.append(row)
+    fn = str(tmp_path / 'export.xlsx')
+    wb.save(fn)
+    parsed = snapshot.loadorparse(fn, plotprojectdata.getbillingtable_file)
+    loaded = snapshot.load(fn)
+    assert parsed['numbers'] == loaded['numbers'] == ['1001', '1002']
+    assert parsed['employee'].tolist() == loaded['employee'].tolist() == [0, 1, 0]
+    assert parsed['billing'].tolist() == loaded['billing'].tolist() == [10050, 25000, 125]
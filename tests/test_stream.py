@@ -0,0 +1,26 @@
+import datetime
+import plotprojectdata
+import stream
+
+def _assert_same(streamed, summary):
+    assert streamed['numbers'] == summary['numbers']
+    assert streamed['names'] == summary['names']
+    for key in ('first_month', 'num_months', 'first_week', 'num_weeks', 'first_year'):
+        assert streamed[key] == summary['periods'][key]
+    for key in ('by_month', 'by_week', 'by_year'):
+        ### bit for bit, not approximately
+        assert streamed[key].tobytes() == summary['periods'][key].tobytes()
+
+def test_stream_matches_summarize(csvexport):
+    fn = csvexport(n=3000, start='2023-11-15', days=500, employees=25, low=-500, high=20000)
+    table = plotprojectdata.getbillingtable_file(fn)
+    for chunksize in (100, 1024, 10**6):
+        streamed = stream.periods(fn, chunksize=chunksize)
+        _assert_same(streamed, plotprojectdata.summarize(table, None, False))
+
+def test_stream_matches_summarize_window(csvexport):
+    fn = csvexport(n=3000, start='2023-11-15', days=500, employees=25, low=-500, high=20000)
+    table = plotprojectdata.getbillingtable_file(fn)
+    for start, end in ((datetime.date(2024, 2, 10), datetime.date(2024, 9, 3)), (None, datetime.date(2024, 1, 31)), (datetime.date(2024, 12, 30), None)):
+        streamed = stream.periods(fn, start, end, chunksize=500)
+        _assert_same(streamed, plotprojectdata.summarize(table, None, False, window=(start, end)))
@@ -0,0 +1,72 @@
+import numpy as np
+import ledger
+import plotprojectdata
+import utilization
+
+### months since 1970-01
+january, february = (2024-1970)*12, (2024-1970)*12 + 1
+
+def _index():
+    ### employee 2 is on both projects and renamed on the second
+    return utilization.buildindex([
+        ('P1', ['1', '2'], ['A', 'B'], [0, 1, 0], [january, january, february], [100000, 50000, 200000]),
+        ('P2', ['2', '3'], ['B2', 'C'], [0, 1], [january, february], [70000, 10000]),
+    ])
+
+def test_buildindex():
+    index = _index()
+    assert index['numbers'] == ['1', '2', '3'] and index['names'] == ['A', 'B2', 'C']
+    assert index['projects'] == ['P1', 'P2']
+    assert index['offsets'].tolist() == [0, 2, 4, 5]
+    assert index['employee'].tolist() == [0, 0, 1, 1, 2]
+    assert index['project'].tolist() == [0, 0, 0, 1, 1]
+    assert index['month'].tolist() == [january, february, january, january, february]
+
+def test_lookup():
+    index = _index()
+    entries = utilization.lookup(index, 2)
+    assert entries['project'] == ['P1', 'P2']
+    assert entries['month'].astype(str).tolist() == ['2024-01', '2024-01']
+    assert entries['amount'].tolist() == [500., 700.]
+    entries = utilization.lookup(index, '1', '2024-02-01', '2024-02-29')
+    assert entries['project'] == ['P1'] and entries['amount'].tolist() == [2000.]
+    assert utilization.lookup(index, '1', None, '2023-12-31')['project'] == []
+    assert utilization.lookup(index, '4')['project'] == []
+
+def test_utilization():
+    index = _index()
+    result = utilization.utilization(index, capacity=1)
+    assert result['months'].astype(str).tolist() == ['2024-01', '2024-02']
+    assert result['billing'].tolist() == [[1000., 2000.], [1200., 0.], [0., 100.]]
+    assert result['projects'].tolist() == [[1, 1], [2, 0], [0, 1]]
+    assert result['num_projects'].tolist() == [1, 2, 1]
+    assert result['overbooked'].tolist() == [[False, True], [True, False], [False, False]]
+    february_only = utilization.utilization(index, '2024-02-01', None)
+    assert february_only['billing'].tolist() == [[2000.], [0.], [100.]]
+    assert 'utilization' not in february_only
+
+def test_fromsummaries_matches_fromledgers(tmp_path, csvexport):
+    summaries = {}
+    for p, seed in (('1001', 0), ('1002', 1)):
+        table = plotprojectdata.getbillingtable_file(csvexport(name=p+'.csv', seed=seed, employees=5+seed))
+        summaries[p] = plotprojectdata.summarize(table, None, False)
+        db = ledger.connect(str(tmp_path / 'ledger'), p)
+        ledger.ingest(db, table)
+        db.commit()
+        db.close()
+    fromsummaries = utilization.fromsummaries(summaries)
+    fromledgers = utilization.fromledgers(str(tmp_path / 'ledger'))
+    for key in ('numbers', 'names', 'projects'):
+        assert fromsummaries[key] == fromledgers[key]
+    for key in ('offsets', 'employee', 'project', 'month', 'amount'):
+        assert np.array_equal(fromsummaries[key], fromledgers[key])
+
+def test_projects_without_a_ledger_are_left_out(tmp_path, csvexport):
+    table = plotprojectdata.getbillingtable_file(csvexport())
+    db = ledger.connect(str(tmp_path), '1001')
+    ledger.ingest(db, table)
+    db.commit()
+    db.close()
+    index = utilization.fromledgers(str(tmp_path), ['1001', '1002'])
+    assert index['projects'] == ['1001']
+    assert index['amount'].sum() == table['billing'].sum()
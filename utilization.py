@@ -0,0 +1,197 @@
+import os
+import glob
+import sqlite3
+import argparse
+import datetime
+import numpy as np
+import decode
+import ledger
+
+### cross-project employee index: employee number -> (project, month, amount) for every month an employee billed on a project
+###   built from the per-project ledgers (ledger.py) or from project summaries (plotprojectdata.summarize)
+###   entries are sorted by employee, project and month, offsets[k]:offsets[k+1] are the entries of employee k,
+###   so a lookup is a dict lookup and a slice and a portfolio report is a bincount over all entries
+###   amounts in øre, months since 1970-01 as in ledger.py
+### exports have no hours, so utilization is billing over a capacity in KNOK per employee and month
+
+def buildindex(projects):
+    ### projects: (project, numbers, names, employee codes, months, amounts) of every project; employees are merged by number,
+    ### the name seen last wins
+    position = {}
+    names = []
+    parts = []
+    projectnames = []
+    for p, (project, numbers, employeenames, employee, months, amounts) in enumerate(projects):
+        codes = np.empty(len(numbers), dtype=np.int64)
+        for k, (number, name) in enumerate(zip(numbers, employeenames)):
+            number = str(number)
+            if number not in position:
+                position[number] = len(names)
+                names.append(name)
+            names[position[number]] = name
+            codes[k] = position[number]
+        parts.append((codes[np.asarray(employee, dtype=np.int64)], np.full(len(months), p, dtype=np.int64),
+                      np.asarray(months, dtype=np.int64), np.asarray(amounts, dtype=np.int64)))
+        projectnames.append(str(project))
+    employee, project, month, amount = [np.concatenate([part[k] for part in parts]) if parts else np.zeros(0, dtype=np.int64) for k in range(4)]
+    order = np.lexsort((month, project, employee))
+    numbers = list(position)
+    return {
+        'numbers': numbers,
+        'names': names,
+        'position': position,
+        'projects': projectnames,
+        'offsets': np.r_[0, np.cumsum(np.bincount(employee, minlength=len(numbers)))],
+        'employee': employee[order],
+        'project': project[order],
+        'month': month[order],
+        'amount': amount[order],
+    }
+
+def _ledgerentries(fn):
+    db = sqlite3.connect('file:'+fn+'?mode=ro', uri=True)
+    try:
+        employees = db.execute("select employee, name from employees order by position").fetchall()
+        rows = db.execute("select employee, month, amount from months where amount != 0").fetchall()
+    finally:
+        db.close()
+    position = {employee: k for k, (employee, _) in enumerate(employees)}
+    return ([employee for employee, _ in employees], [name for _, name in employees],
+            [position[employee] for employee, _, _ in rows], [month for _, month, _ in rows], [amount for _, _, amount in rows])
+
+def fromledgers(ledgerdir, projects=None):
+    ### all ledgers in ledgerdir, or those of the given projects; projects without billings have no ledger and are left out
+    if projects is None:
+        fnames = sorted(glob.glob(ledger.ledgername(ledgerdir, '*')))
+        prefix, suffix = ledger.ledgername('', '*').split('*')
+        projects = [os.path.basename(fn)[len(prefix):-len(suffix)] for fn in fnames]
+    else:
+        projects = [p for p in projects if os.path.exists(ledger.ledgername(ledgerdir, p))]
+        fnames = [ledger.ledgername(ledgerdir, p) for p in projects]
+    return buildindex((p,)+_ledgerentries(fn) for p, fn in zip(projects, fnames))
+
+def _summaryentries(summary):
+    by_month = summary['billings_by_employees_by_month']
+    employee, month = np.nonzero(by_month)
+    first_month = summary['periods']['first_month'].astype(np.int64)
+    return (summary['numbers'], summary['names'], employee, month + first_month, np.rint(by_month[employee, month]*decode.subunits))
+
+def fromsummaries(summaries):
+    return buildindex((p,)+_summaryentries(summary) for p, summary in summaries.items() if 'periods' in summary)
+
+def _months(start, end):
+    ### inclusive month window, either end None for open
+    start = -2**62 if start is None else int(np.datetime64(start, 'M').astype(np.int64))
+    end = 2**62 if end is None else int(np.datetime64(end, 'M').astype(np.int64))
+    return start, end
+
+def lookup(index, number, start=None, end=None):
+    ### (project, month, amount in NOK) of one employee, by project and month
+    k = index['position'].get(str(number))
+    if k is None:
+        return {'project': [], 'month': np.array([], dtype='datetime64[M]'), 'amount': np.zeros(0)}
+    entries = slice(index['offsets'][k], index['offsets'][k+1])
+    month = index['month'][entries]
+    start, end = _months(start, end)
+    inside = (month >= start) & (month <= end)
+    return {
+        'project': [index['projects'][p] for p in index['project'][entries][inside].tolist()],
+        'month': month[inside].astype('datetime64[M]'),
+        'amount': index['amount'][entries][inside]/decode.subunits,
+    }
+
+def utilization(index, start=None, end=None, capacity=None):
+    ### employee x month billings over all projects and the number of projects billed on, capacity in KNOK per employee and month;
+    ### months span the entries of the window
+    start, end = _months(start, end)
+    inside = (index['month'] >= start) & (index['month'] <= end)
+    employee = index['employee'][inside]
+    month = index['month'][inside]
+    num_employees = len(index['numbers'])
+    first_month = int(month.min()) if len(month) else 0
+    num_months = int(month.max()) - first_month + 1 if len(month) else 0
+    flat = employee*num_months + month - first_month
+    billing = np.bincount(flat, weights=index['amount'][inside], minlength=num_employees*num_months).reshape(num_employees, num_months)
+    ### an employee has at most one entry per project and month
+    projects = np.bincount(flat, minlength=num_employees*num_months).reshape(num_employees, num_months)
+    pairs = np.unique(employee*len(index['projects']) + index['project'][inside])
+    result = {
+        'months': np.datetime64(first_month, 'M') + np.arange(num_months),
+        'billing': billing/decode.subunits,
+        'projects': projects,
+        'num_projects': np.bincount(pairs // max(len(index['projects']), 1), minlength=num_employees),
+    }
+    if capacity:
+        result['utilization'] = result['billing']/(capacity*1000)
+        result['overbooked'] = result['utilization'] > 1
+    return result
+
+def printutilization(index, result, capacity=None):
+    ### employees by their busiest month, then the overbooked employee months
+    billing = result['billing']
+    months = result['months']
+    active = np.flatnonzero(billing.any(axis=1))
+    busiest = billing.max(axis=1, initial=0)
+    active = active[np.argsort(-busiest[active], kind='stable')]
+    ln = max([len("Employee")]+[len(index['names'][k]) for k in active])
+    print("")
+    print("Utilization [KNOK]"+(" (capacity "+str(capacity)+" KNOK per month)" if capacity else "")+":")
+    head = str("Employee").ljust(ln, ' ')+" |"+"number".rjust(8, ' ')+"projects".rjust(9, ' ')+"total".rjust(9, ' ')+"busiest".rjust(9, ' ')+"month".rjust(9, ' ')
+    if capacity:
+        head += "max [%]".rjust(9, ' ')+"over".rjust(6, ' ')
+    print(head)
+    print(str("-").ljust(ln, '-')+"--"+str("-").rjust(len(head)-ln-2, '-'))
+    for k in active:
+        m = int(np.argmax(billing[k]))
+        tmp = index['names'][k].ljust(ln, ' ')+" |"+str(index['numbers'][k]).rjust(8, ' ')+str(result['num_projects'][k]).rjust(9, ' ')
+        tmp += str(int(billing[k].sum()/1000)).rjust(9, ' ')+str(int(busiest[k]/1000)).rjust(9, ' ')+str(months[m]).rjust(9, ' ')
+        if capacity:
+            tmp += str(int(100*result['utilization'][k, m])).rjust(9, ' ')+str(int(result['overbooked'][k].sum())).rjust(6, ' ')
+        print(tmp)
+    if not capacity:
+        return
+    employees, overbooked = np.nonzero(result['overbooked'])
+    print("")
+    print("Overbooked employee months:", len(employees))
+    for k, m in zip(employees.tolist(), overbooked.tolist()):
+        entries = lookup(index, index['numbers'][k], months[m], months[m])
+        split = ", ".join(p+": "+str(int(a/1000)) for p, a in sorted(zip(entries['project'], entries['amount']), key=lambda x: -x[1]))
+        print(index['names'][k], "("+str(index['numbers'][k])+")", months[m], str(int(100*result['utilization'][k, m]))+"%:", split)
+
+def printemployee(index, number, start=None, end=None):
+    entries = lookup(index, number, start, end)
+    k = index['position'].get(str(number))
+    print("")
+    print("Employee", number, "("+index['names'][k]+")" if k is not None else "(not in any project)")
+    if not entries['project']:
+        return
+    months = np.unique(entries['month'])
+    projects = sorted(set(entries['project']))
+    ln = max(len("Project"), max(len(p) for p in projects))
+    print(str("Project").ljust(ln, ' ')+" |"+"".join(str(m).rjust(9, ' ') for m in months))
+    print(str("-").ljust(ln, '-')+"--"+str("-").rjust(9*len(months), '-'))
+    split = np.zeros((len(projects), len(months)))
+    split[[projects.index(p) for p in entries['project']], np.searchsorted(months, entries['month'])] = entries['amount']
+    for p, values in zip(projects, split):
+        print(p.ljust(ln, ' ')+" |"+"".join(str(int(v/1000)).rjust(9, ' ') for v in values))
+    print(str("-").ljust(ln, '-')+"--"+str("-").rjust(9*len(months), '-'))
+    print(str("total").ljust(ln, ' ')+" |"+"".join(str(int(v/1000)).rjust(9, ' ') for v in split.sum(axis=0)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Billings of employees across all projects in a directory of ledgers')
+    parser.add_argument('--ledger', metavar='ledger', required=True, type=str, help='directory of per-project ledgers (see plotprojectdata.py --ledger)')
+    parser.add_argument('--capacity', metavar='capacity', required=False, type=float, help='capacity in KNOK per employee and month, months above it are overbooked')
+    parser.add_argument('--employee', metavar='employee', required=False, action='append', default=[], help='employee number to split by project and month, can be repeated')
+    parser.add_argument('--startdate', metavar='startdate', required=False, type=str, help='start date in format dmY')
+    parser.add_argument('--enddate', metavar='enddate', required=False, type=str, help='end date in format dmY')
+    args = parser.parse_args()
+
+    start = datetime.datetime.strptime(args.startdate, "%d%m%Y").date() if args.startdate else None
+    end = datetime.datetime.strptime(args.enddate, "%d%m%Y").date() if args.enddate else None
+    index = fromledgers(args.ledger)
+    print(len(index['projects']), "projects,", len(index['numbers']), "employees")
+    for number in args.employee:
+        printemployee(index, number, start, end)
+    if not args.employee:
+        printutilization(index, utilization(index, start, end, args.capacity), args.capacity)